@@ -6,17 +6,19 @@ This dashboard provides insights into the AI papers dataset stored in the Neon d
 It displays various metrics, charts, and analysis of the research papers.
 """
 
+import json
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import psycopg2
-from datetime import datetime, timedelta
+from datetime import datetime
 import logging
 
 # Import our database connection module
-from modules.db_connection import get_database_connection, close_connection
+from modules.db_connection import create_pool, apply_session_settings, ANALYTICS_SETTINGS
+from modules.create_papers_table import PAPERS_VIEWS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -55,44 +57,175 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# papers columns the dashboard reports on; "Total Fields" is their count
+DASHBOARD_FIELDS = [
+    'id', 'title', 'doi', 'publication_year', 'publication_date', 'created_date',
+    'is_open_access', 'oa_status', 'cited_by_count', 'referenced_works_count',
+    'authors_count', 'countries_distinct_count', 'institutions_distinct_count',
+    'citation_normalized_percentile', 'is_in_top_1_percent', 'is_in_top_10_percent',
+    'journal_name', 'primary_topic_name', 'primary_subfield_name', 'primary_field_name',
+    'primary_domain_name', 'paper_type', 'language', 'created_at',
+]
+
+# Dashboard queries, run as plain parameterized statements. They are not
+# PREPAREd: behind Neon's transaction-mode pooler each statement can land on a
+# backend that never saw the PREPARE
+DASHBOARD_QUERIES = {
+    'q_top_cited': """
+    SELECT title, cited_by_count, publication_year
+    FROM papers_top_cited
+    ORDER BY cited_by_count DESC
+    LIMIT %s
+    """,
+    'q_domain_counts': "SELECT name, papers FROM papers_domain_counts ORDER BY papers DESC LIMIT %s",
+    'q_field_counts': "SELECT name, papers FROM papers_field_counts ORDER BY papers DESC LIMIT %s",
+    'q_journal_counts': "SELECT name, papers FROM papers_journal_counts ORDER BY papers DESC LIMIT %s",
+    # Separate scalar query so the window is a range scan on idx_papers_created_at_brin
+    'q_recent_count': """
+    SELECT COUNT(*) AS recent_papers
+    FROM papers
+    WHERE created_at >= NOW() - INTERVAL '7 days'
+    """,
+    'q_summary_metrics': """
+    SELECT
+        COUNT(*) AS total_papers,
+        COUNT(*) FILTER (WHERE cited_by_count > 0) AS papers_with_citations,
+        (AVG(cited_by_count) FILTER (WHERE cited_by_count > 0))::float8 AS avg_citations,
+        COUNT(doi) AS papers_with_doi,
+        COUNT(publication_date) AS papers_with_date,
+        COUNT(cited_by_count) AS papers_with_citation_count,
+        COUNT(*) FILTER (
+            WHERE title IS NOT NULL
+              AND publication_date IS NOT NULL
+              AND cited_by_count IS NOT NULL
+        ) AS complete_records,
+        MAX(created_at) AS last_update,
+        COUNT(DISTINCT journal_name) AS unique_journals
+    FROM papers
+    """,
+}
+
+def read_query(connection, name, params=(), dtype=None, parse_dates=None):
+    """Run a dashboard query from DASHBOARD_QUERIES and return the rows as a DataFrame."""
+    cursor = connection.cursor()
+    try:
+        cursor.execute(DASHBOARD_QUERIES[name], params or None)
+        columns = [column.name for column in cursor.description]
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    if dtype:
+        df = df.astype(dtype)
+    for column in parse_dates or []:
+        df[column] = pd.to_datetime(df[column])
+    return df
+
+def fetch_daily_counts(connection):
+    """Fetch the number of papers published per day."""
+    query = "SELECT day, papers FROM papers_daily_counts ORDER BY day"
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+    
+    daily_counts = pd.DataFrame.from_records(rows, columns=['day', 'papers'])
+    daily_counts['day'] = pd.to_datetime(daily_counts['day'])
+    daily_counts['papers'] = daily_counts['papers'].astype('int64')
+    return daily_counts
+
+def fetch_top_cited(connection, n=10):
+    """Fetch the n most cited papers."""
+    return read_query(
+        connection, 'q_top_cited', (n,),
+        dtype={'cited_by_count': 'int64', 'publication_year': 'Int64'}
+    )
+
+def fetch_domain_counts(connection, n=10):
+    """Fetch paper counts for the top n primary domains."""
+    return read_query(connection, 'q_domain_counts', (n,), dtype={'papers': 'int64'})
+
+def fetch_field_counts(connection, n=10):
+    """Fetch paper counts for the top n primary fields."""
+    return read_query(connection, 'q_field_counts', (n,), dtype={'papers': 'int64'})
+
+def fetch_journal_counts(connection, n=15):
+    """Fetch paper counts for the top n journals."""
+    return read_query(connection, 'q_journal_counts', (n,), dtype={'papers': 'int64'})
+
+def fetch_summary_metrics(connection):
+    """
+    Fetch every scalar shown in the key metrics and data quality sections.
+    
+    All counts come from a single pass over papers and are returned as a plain
+    dict, so each section formats precomputed numbers instead of rescanning.
+    """
+    summary = read_query(connection, 'q_summary_metrics', parse_dates=['last_update']).iloc[0].to_dict()
+    summary['recent_papers'] = int(read_query(connection, 'q_recent_count').iloc[0]['recent_papers'])
+    return summary
+
+@st.cache_resource(show_spinner=False, validate=lambda pool: pool is not None and not pool.closed)
+def get_connection_pool():
+    """Get the dashboard connection pool, kept alive across reruns."""
+    return create_pool(1, 8)
+
+def fetch_freshness_token(connection):
+    """Fetch the papers write counters, a cheap key that changes when papers are loaded."""
+    cursor = connection.cursor()
+    # A catalog lookup rather than MAX(created_at), which a BRIN index cannot answer;
+    # the views are included so a refresh after the load also busts the cache
+    cursor.execute("""
+    SELECT SUM(n_tup_ins + n_tup_upd + n_tup_del)
+    FROM pg_stat_user_tables
+    WHERE relname = ANY(%s)
+    """, (['papers'] + PAPERS_VIEWS,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else None
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_dashboard_data(_connection, freshness_token):
+    """
+    Run the aggregate queries behind each dashboard section.
+    
+    Results are memoized per freshness token (and for at most five minutes), so
+    reruns triggered by widget interaction do not hit the database again.
+    The queries share one read transaction, so the tuning is applied with SET
+    LOCAL and holds behind a transaction-mode pooler.
+    """
+    apply_session_settings(_connection, ANALYTICS_SETTINGS, local=True)
+    return {
+        'summary': fetch_summary_metrics(_connection),
+        'daily_counts': fetch_daily_counts(_connection),
+        'top_cited': fetch_top_cited(_connection),
+        'domain_counts': fetch_domain_counts(_connection),
+        'field_counts': fetch_field_counts(_connection),
+        'journal_counts': fetch_journal_counts(_connection),
+    }
+
 def get_database_data():
-    """Fetch data from the database and return as a pandas DataFrame."""
+    """
+    Fetch the aggregated datasets behind each dashboard section.
+
+    Every chart is computed server-side so only a few dozen rows cross the wire,
+    regardless of the size of the papers table.
+    """
     try:
-        connection = get_database_connection()
-        if not connection:
+        pool = get_connection_pool()
+        if not pool:
             st.error("❌ Failed to connect to database. Please check your connection settings.")
             return None
         
-        # Query to get all papers data
-        query = """
-        SELECT 
-            id, title, doi, publication_year, publication_date, created_date,
-            is_open_access, oa_status, cited_by_count, referenced_works_count,
-            authors_count, countries_distinct_count, institutions_distinct_count,
-            citation_normalized_percentile, is_in_top_1_percent, is_in_top_10_percent,
-            journal_name, primary_topic_name, primary_subfield_name, primary_field_name,
-            primary_domain_name, paper_type, language, created_at
-        FROM papers
-        ORDER BY created_at DESC
-        """
-        
-        df = pd.read_sql_query(query, connection)
-        connection.close()
-        
-        # Convert date columns
-        date_columns = ['publication_date', 'created_date', 'created_at']
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        # Convert numeric columns
-        numeric_columns = ['cited_by_count', 'referenced_works_count', 'authors_count', 
-                          'countries_distinct_count', 'institutions_distinct_count']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        
-        return df
+        connection = pool.getconn()
+        try:
+            freshness_token = fetch_freshness_token(connection)
+            return load_dashboard_data(connection, freshness_token)
+        finally:
+            # putconn rolls back the open read transaction (and its SET LOCALs)
+            pool.putconn(connection)
     
     except Exception as e:
         st.error(f"❌ Error fetching data: {str(e)}")
@@ -107,63 +240,48 @@ def display_header():
     """)
     st.markdown("---")
 
-def display_key_metrics(df):
+def display_key_metrics(metrics):
     """Display key metrics in cards."""
     st.subheader("📈 Key Metrics")
     
+    total_papers = int(metrics['total_papers'])
+    papers_with_citations_count = int(metrics['papers_with_citations'])
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_papers = len(df)
         st.metric("Total Papers", f"{total_papers:,}")
     
     with col2:
-        recent_papers = len(df[df['created_at'] >= datetime.now() - timedelta(days=7)])
-        st.metric("Papers (Last 7 Days)", f"{recent_papers:,}")
+        st.metric("Papers (Last 7 Days)", f"{int(metrics['recent_papers']):,}")
     
     with col3:
-        # Calculate average citations excluding papers with 0 or null citations
-        papers_with_citations = df[df['cited_by_count'] > 0]
-        if len(papers_with_citations) > 0:
-            avg_citations = papers_with_citations['cited_by_count'].mean()
-            st.metric("Avg Citations (Non-zero)", f"{avg_citations:.1f}")
+        # Average citations excluding papers with 0 or null citations
+        if papers_with_citations_count > 0:
+            st.metric("Avg Citations (Non-zero)", f"{metrics['avg_citations']:.1f}")
         else:
             st.metric("Avg Citations (Non-zero)", "N/A")
     
     with col4:
-        papers_with_citations = df[df['cited_by_count'] > 0]
-        papers_with_citations_count = len(papers_with_citations)
-        papers_with_citations_pct = (papers_with_citations_count / len(df)) * 100
+        papers_with_citations_pct = (papers_with_citations_count / total_papers) * 100 if total_papers else 0
         st.metric("Papers with Citations", f"{papers_with_citations_count:,} ({papers_with_citations_pct:.1f}%)")
 
-def display_publication_trends(df):
-    """Display publication trends over time."""
-    st.subheader("📅 Publication Trends")
-    
-    # Filter out papers without publication date
-    df_with_date = df[df['publication_date'].notna()]
-    
-    if len(df_with_date) > 0:
-        # Papers published by day
-        daily_counts = df_with_date.groupby(df_with_date['publication_date'].dt.date).size()
-        
-        fig = px.line(
-            x=daily_counts.index,
-            y=daily_counts.values,
-            title="Papers Published by Day",
-            labels={'x': 'Publication Date', 'y': 'Number of Papers'},
-            markers=True
-        )
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
-
-def display_citation_analysis(df):
-    """Display citation analysis and metrics."""
-    st.subheader("📚 Citation Analysis")
-    
-    # Top cited papers
-    top_papers = df.nlargest(10, 'cited_by_count')[['title', 'cited_by_count', 'publication_year']]
-    
+@st.cache_data(ttl=300, show_spinner=False)
+def build_daily_counts_figure(daily_counts):
+    """Build the papers-per-day line chart and return it as Plotly JSON."""
+    fig = px.line(
+        x=daily_counts['day'],
+        y=daily_counts['papers'],
+        title="Papers Published by Day",
+        labels={'x': 'Publication Date', 'y': 'Number of Papers'},
+        markers=True
+    )
+    fig.update_layout(height=400)
+    return fig.to_json()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def build_top_cited_figure(top_papers):
+    """Build the most cited papers bar chart and return it as Plotly JSON."""
     fig = px.bar(
         x=top_papers['cited_by_count'],
         y=top_papers['title'].str[:50] + '...',
@@ -172,11 +290,41 @@ def display_citation_analysis(df):
         labels={'x': 'Citations', 'y': 'Paper Title'}
     )
     fig.update_layout(height=400)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig.to_json()
 
+@st.cache_data(ttl=300, show_spinner=False)
+def build_counts_figure(counts, title, y_label, height):
+    """Build a horizontal paper-count bar chart and return it as Plotly JSON."""
+    fig = px.bar(
+        x=counts['papers'],
+        y=counts['name'],
+        orientation='h',
+        title=title,
+        labels={'x': 'Number of Papers', 'y': y_label}
+    )
+    fig.update_layout(height=height)
+    return fig.to_json()
 
+def display_publication_trends(daily_counts):
+    """Display publication trends over time."""
+    st.subheader("📅 Publication Trends")
+    
+    if len(daily_counts) > 0:
+        # Papers published by day
+        fig = build_daily_counts_figure(daily_counts)
+        st.plotly_chart(json.loads(fig), use_container_width=True)
 
-def display_topic_analysis(df):
+def display_citation_analysis(top_papers):
+    """Display citation analysis and metrics."""
+    st.subheader("📚 Citation Analysis")
+    
+    # Top cited papers
+    fig = build_top_cited_figure(top_papers)
+    st.plotly_chart(json.loads(fig), use_container_width=True)
+
+
+
+def display_topic_analysis(domain_counts, field_counts):
     """Display topic and field analysis."""
     st.subheader("🏷️ Topic Analysis")
     
@@ -184,81 +332,53 @@ def display_topic_analysis(df):
     
     with col1:
         # Primary domain distribution
-        domain_counts = df['primary_domain_name'].value_counts().head(10)
-        
-        fig = px.bar(
-            x=domain_counts.values,
-            y=domain_counts.index,
-            orientation='h',
-            title="Top 10 Primary Domains",
-            labels={'x': 'Number of Papers', 'y': 'Domain'}
-        )
-        fig.update_layout(height=400)
-        st.plotly_chart(fig, use_container_width=True)
+        fig = build_counts_figure(domain_counts, "Top 10 Primary Domains", 'Domain', 400)
+        st.plotly_chart(json.loads(fig), use_container_width=True)
     
     with col2:
         # Primary field distribution
-        field_counts = df['primary_field_name'].value_counts().head(10)
-        
-        fig2 = px.bar(
-            x=field_counts.values,
-            y=field_counts.index,
-            orientation='h',
-            title="Top 10 Primary Fields",
-            labels={'x': 'Number of Papers', 'y': 'Field'}
-        )
-        fig2.update_layout(height=400)
-        st.plotly_chart(fig2, use_container_width=True)
-
-def display_journal_analysis(df):
+        fig2 = build_counts_figure(field_counts, "Top 10 Primary Fields", 'Field', 400)
+        st.plotly_chart(json.loads(fig2), use_container_width=True)
+
+def display_journal_analysis(journal_counts):
     """Display journal and source analysis."""
     st.subheader("📖 Journal Analysis")
     
     # Top journals by paper count
-    journal_counts = df['journal_name'].value_counts().head(15)
-    
-    fig = px.bar(
-        x=journal_counts.values,
-        y=journal_counts.index,
-        orientation='h',
-        title="Top 15 Journals by Number of Papers",
-        labels={'x': 'Number of Papers', 'y': 'Journal Name'}
-    )
-    fig.update_layout(height=500)
-    st.plotly_chart(fig, use_container_width=True)
+    fig = build_counts_figure(journal_counts, "Top 15 Journals by Number of Papers", 'Journal Name', 500)
+    st.plotly_chart(json.loads(fig), use_container_width=True)
 
-def display_data_quality_metrics(df):
+def display_data_quality_metrics(metrics):
     """Display data quality metrics."""
     st.subheader("🔍 Data Quality Metrics")
     
+    total_papers = int(metrics['total_papers'])
+    
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        # Missing data percentages
-        missing_data = df.isnull().sum()
-        missing_pct = (missing_data / len(df)) * 100
-        
-        st.metric("Papers with DOI", f"{df['doi'].notna().sum():,}")
-        st.metric("Papers with Date", f"{df['publication_date'].notna().sum():,}")
-        st.metric("Papers with Citations", f"{df['cited_by_count'].notna().sum():,}")
+        st.metric("Papers with DOI", f"{int(metrics['papers_with_doi']):,}")
+        st.metric("Papers with Date", f"{int(metrics['papers_with_date']):,}")
+        st.metric("Papers with Citations", f"{int(metrics['papers_with_citation_count']):,}")
     
     with col2:
         # Data completeness
-        complete_records = df.dropna(subset=['title', 'publication_date', 'cited_by_count']).shape[0]
-        completeness_pct = (complete_records / len(df)) * 100
+        complete_records = int(metrics['complete_records'])
+        completeness_pct = (complete_records / total_papers) * 100 if total_papers else 0
         
         st.metric("Complete Records", f"{complete_records:,}")
         st.metric("Completeness %", f"{completeness_pct:.1f}%")
-        st.metric("Total Fields", len(df.columns))
+        st.metric("Total Fields", len(DASHBOARD_FIELDS))
     
     with col3:
         # Recent activity
-        last_update = df['created_at'].max()
-        days_since_update = (datetime.now() - last_update).days if last_update else 0
+        last_update = metrics['last_update']
+        has_update = pd.notna(last_update)
+        days_since_update = (datetime.now() - last_update).days if has_update else 0
         
-        st.metric("Last Update", last_update.strftime('%Y-%m-%d') if last_update else 'N/A')
+        st.metric("Last Update", last_update.strftime('%Y-%m-%d') if has_update else 'N/A')
         st.metric("Days Since Update", days_since_update)
-        st.metric("Unique Journals", df['journal_name'].nunique())
+        st.metric("Unique Journals", int(metrics['unique_journals']))
 
 def main():
     """Main function to run the dashboard."""
@@ -268,37 +388,38 @@ def main():
         
         # Load data
         with st.spinner("🔄 Loading data from database..."):
-            df = get_database_data()
+            data = get_database_data()
         
-        if df is None:
+        if data is None:
             st.error("❌ Could not load data. Please check your database connection.")
             return
         
         # Display success message
-        st.success(f"✅ Successfully loaded {len(df):,} papers from database!")
+        total_papers = int(data['summary']['total_papers'])
+        st.success(f"✅ Successfully loaded {total_papers:,} papers from database!")
         
         # Display key metrics
-        display_key_metrics(df)
+        display_key_metrics(data['summary'])
         st.markdown("---")
         
         # Display publication trends
-        display_publication_trends(df)
+        display_publication_trends(data['daily_counts'])
         st.markdown("---")
         
         # Display citation analysis
-        display_citation_analysis(df)
+        display_citation_analysis(data['top_cited'])
         st.markdown("---")
         
         # Display topic analysis
-        display_topic_analysis(df)
+        display_topic_analysis(data['domain_counts'], data['field_counts'])
         st.markdown("---")
         
         # Display journal analysis
-        display_journal_analysis(df)
+        display_journal_analysis(data['journal_counts'])
         st.markdown("---")
         
         # Display data quality metrics
-        display_data_quality_metrics(df)
+        display_data_quality_metrics(data['summary'])
         
         # Footer
         st.markdown("---")
@@ -4,19 +4,143 @@ Script to create the papers table in PostgreSQL database using the simplified sc
 Uses the existing db_connection.py module for database connectivity.
 """
 
+import io
 import logging
+from functools import lru_cache
+import psycopg2
+from psycopg2 import sql
 from .db_connection import get_database_connection, close_connection
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def create_papers_table(connection):
+# Columns refreshed when an upserted paper already exists
+UPSERT_UPDATE_COLUMNS = [
+    'title', 'display_name', 'publication_year', 'publication_date',
+    'cited_by_count', 'referenced_works_count', 'authors_count',
+    'countries_distinct_count', 'institutions_distinct_count',
+    'citation_normalized_percentile', 'is_in_top_1_percent', 'is_in_top_10_percent'
+]
+
+# Index definitions for efficient querying: (index name, column, options).
+# Supported options: method (btree/brin/hash...), order (ASC/DESC),
+# with (storage parameters) and where (partial index predicate).
+INDEX_SPECS = [
+    ("idx_papers_publication_year", "publication_year", {}),
+    ("idx_papers_cited_by_count", "cited_by_count", {}),
+    ("idx_papers_is_open_access", "is_open_access", {}),
+    ("idx_papers_primary_domain", "primary_domain_name", {}),
+    ("idx_papers_primary_field", "primary_field_name", {}),
+    ("idx_papers_journal", "journal_name", {}),
+    # created_at follows insert order, so a tiny BRIN index prunes "recent papers" scans
+    ("idx_papers_created_at_brin", "created_at", {"method": "brin", "with": {"pages_per_range": 32}}),
+    # Partial index matching the dashboard's open access query
+    ("idx_papers_oa_true", "publication_year", {"where": "is_open_access"}),
+    # Near-empty partial index over out-of-range topic scores (data quality examples)
+    ("idx_papers_topic_score_anomalies", "primary_topic_score",
+     {"where": "primary_topic_score < 0 OR primary_topic_score > 1"}),
+]
+
+# Indexes no longer in INDEX_SPECS, dropped from existing databases:
+# - idx_papers_created_at: the original B-tree, replaced by idx_papers_created_at_brin
+# - idx_papers_top_cited: the top-cited list is read from the papers_top_cited
+#   view, whose refresh is served by idx_papers_cited_by_count
+# Both only slowed down loads.
+OBSOLETE_INDEXES = ["idx_papers_created_at", "idx_papers_top_cited"]
+
+def build_index_sql(name, column, options=None, concurrently=False):
+    """
+    Build a CREATE INDEX statement for the papers table from an index spec.
+    
+    Args:
+        name: Index name
+        column: Indexed column
+        options: Optional method, order, with and where settings (see INDEX_SPECS)
+        concurrently: Emit CREATE INDEX CONCURRENTLY
+        
+    Returns:
+        Composed SQL statement ready for cursor.execute
+    """
+    options = options or {}
+    order = options.get("order", "").upper()
+    if order not in ("", "ASC", "DESC"):
+        raise ValueError(f"Invalid sort order for index {name}: {order}")
+    
+    statement = sql.SQL("CREATE INDEX {concurrently}IF NOT EXISTS {name} ON papers USING {method} ({column}{order})").format(
+        concurrently=sql.SQL("CONCURRENTLY " if concurrently else ""),
+        name=sql.Identifier(name),
+        method=sql.SQL(options.get("method", "btree")),
+        column=sql.Identifier(column),
+        order=sql.SQL(f" {order}" if order else ""),
+    )
+    
+    if options.get("with"):
+        statement += sql.SQL(" WITH ({})").format(sql.SQL(", ").join(
+            sql.SQL("{} = {}").format(sql.Identifier(key), sql.Literal(value))
+            for key, value in options["with"].items()
+        ))
+    
+    if options.get("where"):
+        statement += sql.SQL(" WHERE {}").format(sql.SQL(options["where"]))
+    
+    return statement + sql.SQL(";")
+
+# Materialized views backing the dashboard charts. Each has a unique index so
+# it can be refreshed with REFRESH MATERIALIZED VIEW CONCURRENTLY.
+PAPERS_VIEWS = ['papers_daily_counts', 'papers_domain_counts', 'papers_field_counts',
+                'papers_journal_counts', 'papers_top_cited']
+
+CREATE_VIEWS_SQL = [
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS papers_daily_counts AS
+        SELECT publication_date AS day, COUNT(*) AS papers
+        FROM papers WHERE publication_date IS NOT NULL
+        GROUP BY 1;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_daily_counts_day ON papers_daily_counts(day);
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS papers_domain_counts AS
+        SELECT primary_domain_name AS name, COUNT(*) AS papers
+        FROM papers WHERE primary_domain_name IS NOT NULL
+        GROUP BY 1;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_domain_counts_name ON papers_domain_counts(name);
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS papers_field_counts AS
+        SELECT primary_field_name AS name, COUNT(*) AS papers
+        FROM papers WHERE primary_field_name IS NOT NULL
+        GROUP BY 1;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_field_counts_name ON papers_field_counts(name);
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS papers_journal_counts AS
+        SELECT journal_name AS name, COUNT(*) AS papers
+        FROM papers WHERE journal_name IS NOT NULL
+        GROUP BY 1;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_journal_counts_name ON papers_journal_counts(name);
+    """,
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS papers_top_cited AS
+        SELECT id, title, cited_by_count, publication_year
+        FROM papers WHERE cited_by_count > 0
+        ORDER BY cited_by_count DESC
+        LIMIT 100;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_papers_top_cited_id ON papers_top_cited(id);
+    """
+]
+
+def create_papers_table(connection, *, for_bulk_load=False):
     """
     Create the papers table with the simplified schema if it doesn't exist.
     
+    With for_bulk_load the table is created UNLOGGED and without secondary
+    indexes, so a large initial load skips WAL writes and per-row index
+    maintenance. Call finalize_papers_table() once the load is done.
+    
     Args:
         connection: PostgreSQL database connection
+        for_bulk_load: Create an unlogged, index-free table for a first load
     """
     
     # SQL to create the papers table
@@ -81,29 +205,28 @@ def create_papers_table(connection):
     );
     """
     
-    # SQL to create indexes for efficient querying
-    create_indexes_sql = [
-        "CREATE INDEX IF NOT EXISTS idx_papers_publication_year ON papers(publication_year);",
-        "CREATE INDEX IF NOT EXISTS idx_papers_cited_by_count ON papers(cited_by_count);",
-        "CREATE INDEX IF NOT EXISTS idx_papers_is_open_access ON papers(is_open_access);",
-        "CREATE INDEX IF NOT EXISTS idx_papers_primary_domain ON papers(primary_domain_name);",
-        "CREATE INDEX IF NOT EXISTS idx_papers_journal ON papers(journal_name);",
-        "CREATE INDEX IF NOT EXISTS idx_papers_created_at ON papers(created_at);"
-    ]
+    if for_bulk_load:
+        create_table_sql = create_table_sql.replace("CREATE TABLE", "CREATE UNLOGGED TABLE", 1)
     
     try:
         cursor = connection.cursor()
         
-        # Create the table
-        logger.info("Creating papers table...")
-        cursor.execute(create_table_sql)
-        logger.info("✅ Papers table created successfully!")
+        # Ship the table and index DDL as one multi-statement round trip
+        # (indexes are deferred to finalize_papers_table for bulk loads)
+        if for_bulk_load:
+            full_ddl = create_table_sql
+            logger.info("Creating papers table (indexes deferred until finalize)...")
+        else:
+            full_ddl = sql.SQL("\n").join(
+                [sql.SQL(create_table_sql)]
+                + [sql.SQL("DROP INDEX IF EXISTS {};").format(sql.Identifier(name)) for name in OBSOLETE_INDEXES]
+                + [build_index_sql(*spec) for spec in INDEX_SPECS]
+                + [sql.SQL(view_sql) for view_sql in CREATE_VIEWS_SQL]
+            )
+            logger.info("Creating papers table, indexes and views...")
         
-        # Create indexes
-        logger.info("Creating indexes...")
-        for index_sql in create_indexes_sql:
-            cursor.execute(index_sql)
-        logger.info("✅ All indexes created successfully!")
+        cursor.execute(full_ddl)
+        logger.info("✅ Papers table created successfully!")
         
         # Commit the changes
         connection.commit()
@@ -116,6 +239,271 @@ def create_papers_table(connection):
         connection.rollback()
         return False
 
+def finalize_papers_table(connection):
+    """
+    Turn a bulk-loaded papers table into a regular, fully indexed table.
+    
+    Switches the table back to LOGGED, builds the deferred indexes with
+    CREATE INDEX CONCURRENTLY, refreshes planner statistics and creates the
+    dashboard materialized views. Any pending
+    transaction on the connection is committed first, because concurrent
+    index builds cannot run inside a transaction block.
+    
+    Args:
+        connection: PostgreSQL database connection
+        
+    Returns:
+        True if finalization succeeds, False otherwise
+    """
+    
+    connection.commit()
+    previous_autocommit = connection.autocommit
+    
+    try:
+        connection.autocommit = True
+        cursor = connection.cursor()
+        
+        logger.info("Enabling WAL logging on papers table...")
+        cursor.execute("ALTER TABLE papers SET LOGGED;")
+        
+        logger.info("Creating indexes concurrently...")
+        for spec in INDEX_SPECS:
+            cursor.execute(build_index_sql(*spec, concurrently=True))
+        
+        cursor.execute("ANALYZE papers;")
+        cursor.execute("\n".join(CREATE_VIEWS_SQL))
+        cursor.close()
+        logger.info("✅ Papers table finalized!")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Error finalizing papers table: {e}")
+        return False
+    
+    finally:
+        connection.autocommit = previous_autocommit
+
+def refresh_papers_views(connection):
+    """
+    Refresh the dashboard materialized views after new papers are loaded.
+    
+    Missing views are created first, so databases set up before the views
+    existed pick them up on their next ingest. CONCURRENTLY keeps the views
+    readable by the dashboard while they refresh.
+    
+    Args:
+        connection: PostgreSQL database connection
+        
+    Returns:
+        True if all views were refreshed, False otherwise
+    """
+    
+    try:
+        cursor = connection.cursor()
+        
+        logger.info("Refreshing dashboard views...")
+        cursor.execute("\n".join(CREATE_VIEWS_SQL))
+        for view in PAPERS_VIEWS:
+            cursor.execute(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view};")
+        
+        connection.commit()
+        cursor.close()
+        logger.info("✅ Dashboard views refreshed!")
+        
+        return True
+        
+    except Exception as e:
+        logger.error(f"❌ Error refreshing dashboard views: {e}")
+        connection.rollback()
+        return False
+
+# Session-local staging table for bulk_load_papers upserts
+CREATE_STAGE_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS papers_stage "
+    "(LIKE papers INCLUDING DEFAULTS) ON COMMIT DROP;"
+)
+
+# COPY text format escapes; NULL is written as \N so empty strings stay empty
+_COPY_TEXT_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def encode_copy_row(row):
+    """
+    Encode one row as a line of PostgreSQL COPY text format.
+    
+    None becomes \\N and every other value is written as text with backslash,
+    tab and newline escaped, so an empty string is loaded as '' rather than
+    NULL (CSV's unquoted empty field) and matches what INSERT would store.
+    
+    Args:
+        row: Tuple of column values
+        
+    Returns:
+        Tab-separated, newline-terminated COPY line
+    """
+    return "\t".join(
+        "\\N" if value is None else str(value).translate(_COPY_TEXT_ESCAPES)
+        for value in row
+    ) + "\n"
+
+def bulk_load_papers(connection, rows, columns, upsert=True, return_counts=False,
+                     cursor=None, savepoint=None):
+    """
+    Bulk load paper rows into the papers table with COPY FROM STDIN.
+    
+    Rows are staged in an in-memory COPY text buffer and streamed to the
+    server in a single COPY, which avoids the per-row parse overhead of INSERT.
+    With upsert enabled the rows are copied into a temporary staging table and
+    merged with INSERT ... ON CONFLICT (id) DO UPDATE, so existing papers are
+    refreshed instead of raising unique violations. A single merge cannot touch
+    the same id twice, so duplicate ids are collapsed first, keeping the last
+    copy (the same rule as the INSERT path in process_papers_json). The caller
+    commits.
+    
+    When several loads share one transaction, pass a savepoint name: it is set
+    in the same round trip as the staging DDL and released with the TRUNCATE,
+    so on error the caller can ROLLBACK TO SAVEPOINT and drop only this load.
+    
+    Args:
+        connection: PostgreSQL database connection
+        rows: Iterable of tuples with values ordered like columns
+        columns: Names of the papers columns being loaded (must include id when upserting)
+        upsert: Merge into existing rows instead of plain appending
+        return_counts: Report inserted and updated rows separately (upsert only)
+        cursor: Open cursor to reuse (a new one is opened and closed if omitted)
+        savepoint: Optional savepoint name guarding this load
+        
+    Returns:
+        Number of rows written to papers, or (inserted, updated) with return_counts
+    """
+    
+    if upsert:
+        # Keep the last copy of each id, like a dict-based dedupe would
+        id_index = columns.index('id')
+        rows = {row[id_index]: row for row in rows}.values()
+    
+    buffer = io.StringIO()
+    buffer.writelines(map(encode_copy_row, rows))
+    buffer.seek(0)
+    
+    copy_sql, stage_copy_sql, merge_sql = build_bulk_load_sql(tuple(columns))
+    set_savepoint = f"SAVEPOINT {savepoint}; " if savepoint else ""
+    release_savepoint = f" RELEASE SAVEPOINT {savepoint};" if savepoint else ""
+    
+    own_cursor = cursor is None
+    if own_cursor:
+        cursor = connection.cursor()
+    try:
+        if not upsert:
+            if savepoint:
+                cursor.execute(set_savepoint)
+            cursor.copy_expert(copy_sql, buffer)
+            count = cursor.rowcount
+            if savepoint:
+                cursor.execute(release_savepoint)
+            return count
+        
+        cursor.execute(set_savepoint + CREATE_STAGE_SQL)
+        cursor.copy_expert(stage_copy_sql, buffer)
+        cursor.execute(merge_sql)
+        inserted, updated = cursor.fetchone()
+        cursor.execute("TRUNCATE papers_stage;" + release_savepoint)
+        return (inserted, updated) if return_counts else inserted + updated
+    
+    finally:
+        if own_cursor:
+            cursor.close()
+
+def bulk_load_papers_by_row(connection, rows, columns, savepoint, cursor=None):
+    """
+    Upsert rows one at a time after a batch bulk_load_papers call failed.
+    
+    Every row gets its own savepoint, so a row the server rejects is rolled
+    back and counted on its own instead of taking the rest of the batch with
+    it. Only meant as the slow fallback path; the caller commits.
+    
+    Args:
+        connection: PostgreSQL database connection
+        rows: Tuples with values ordered like columns
+        columns: Names of the papers columns being loaded (must include id)
+        savepoint: Savepoint name guarding each single-row load
+        cursor: Open cursor to reuse (a new one is opened and closed if omitted)
+        
+    Returns:
+        Tuple of (inserted, updated, failed) row counts
+    """
+    inserted = updated = failed = 0
+    # Same keep-last rule as bulk_load_papers, so duplicates aren't upserted twice
+    id_index = columns.index('id')
+    rows = {row[id_index]: row for row in rows}.values()
+    
+    own_cursor = cursor is None
+    if own_cursor:
+        cursor = connection.cursor()
+    try:
+        for row in rows:
+            try:
+                row_inserted, row_updated = bulk_load_papers(
+                    connection, [row], columns, return_counts=True,
+                    cursor=cursor, savepoint=savepoint
+                )
+            except psycopg2.Error as e:
+                logger.error(f"❌ Error loading paper {row[id_index]}: {e}")
+                cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint};")
+                failed += 1
+                continue
+            inserted += row_inserted
+            updated += row_updated
+    finally:
+        if own_cursor:
+            cursor.close()
+    
+    return inserted, updated, failed
+
+@lru_cache(maxsize=8)
+def build_bulk_load_sql(columns):
+    """
+    Build the COPY and merge statements used by bulk_load_papers.
+    
+    Cached per column tuple, so repeated batches reuse the same strings
+    instead of re-joining column lists and SET clauses every call.
+    
+    Args:
+        columns: Tuple of papers column names being loaded
+        
+    Returns:
+        Tuple of (COPY into papers, COPY into papers_stage, merge) statements
+    """
+    column_list = ", ".join(columns)
+    # Text format with its default \N null marker (see encode_copy_row)
+    copy_options = "WITH (FORMAT text)"
+    
+    update_columns = [col for col in UPSERT_UPDATE_COLUMNS if col in columns]
+    update_sql = ",\n            ".join(
+        ["updated_at = CURRENT_TIMESTAMP"] + [f"{col} = EXCLUDED.{col}" for col in update_columns]
+    )
+    
+    # Staged ids are unique (bulk_load_papers dedupes before COPY), so the merge
+    # never touches a row twice. xmax = 0 marks freshly inserted rows; updated
+    # ones carry the updating xid, so both counts come back as a single row
+    merge_sql = f"""
+        WITH merged AS (
+            INSERT INTO papers ({column_list})
+            SELECT {column_list} FROM papers_stage
+            ON CONFLICT (id) DO UPDATE SET
+                {update_sql}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+        FROM merged;
+        """
+    
+    return (
+        f"COPY papers ({column_list}) FROM STDIN {copy_options}",
+        f"COPY papers_stage ({column_list}) FROM STDIN {copy_options}",
+        merge_sql,
+    )
+
 def check_table_exists(connection, table_name="papers"):
     """
     Check if the papers table already exists.
@@ -128,17 +516,12 @@ def check_table_exists(connection, table_name="papers"):
         True if table exists, False otherwise
     """
     
-    check_sql = """
-    SELECT EXISTS (
-        SELECT FROM information_schema.tables 
-        WHERE table_schema = 'public' 
-        AND table_name = %s
-    );
-    """
+    # Single catalog probe instead of scanning the information_schema views
+    check_sql = "SELECT to_regclass(%s) IS NOT NULL;"
     
     try:
         cursor = connection.cursor()
-        cursor.execute(check_sql, (table_name,))
+        cursor.execute(check_sql, (f"public.{table_name}",))
         exists = cursor.fetchone()[0]
         cursor.close()
         return exists
@@ -161,18 +544,22 @@ def get_table_info(connection, table_name="papers"):
     
     info_sql = """
     SELECT 
-        column_name,
-        data_type,
-        is_nullable,
-        column_default
-    FROM information_schema.columns 
-    WHERE table_name = %s 
-    ORDER BY ordinal_position;
+        a.attname AS column_name,
+        format_type(a.atttypid, a.atttypmod) AS data_type,
+        CASE WHEN a.attnotnull THEN 'NO' ELSE 'YES' END AS is_nullable,
+        pg_get_expr(d.adbin, d.adrelid) AS column_default
+    FROM pg_catalog.pg_attribute a
+    LEFT JOIN pg_catalog.pg_attrdef d
+        ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+    WHERE a.attrelid = to_regclass(%s)
+        AND a.attnum > 0
+        AND NOT a.attisdropped
+    ORDER BY a.attnum;
     """
     
     try:
         cursor = connection.cursor()
-        cursor.execute(info_sql, (table_name,))
+        cursor.execute(info_sql, (f"public.{table_name}",))
         columns = cursor.fetchall()
         cursor.close()
         return columns
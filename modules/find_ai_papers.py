@@ -9,11 +9,41 @@ This script:
 4. Saves all papers with all fields in a timestamped JSON file
 """
 
-import json
+import logging
+import math
+import os
+import sys
+import orjson
 import pyalex
+from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from itertools import chain
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+# Pagination settings
+PER_PAGE = 200  # Maximum allowed by OpenAlex
+MAX_PAGES = 50  # Reasonable upper limit for ~10,000 papers
+FETCH_WORKERS = 8  # Concurrent page requests
+
+# Top-level Work fields read by process_papers_json.transform_paper_data;
+# requesting only these shrinks each page several-fold
+WORK_FIELDS = [
+    'id', 'ids', 'doi', 'title', 'display_name',
+    'publication_year', 'publication_date', 'created_date', 'updated_date',
+    'language', 'type', 'type_crossref',
+    'primary_location', 'topics', 'authorships', 'referenced_works',
+    'cited_by_count', 'is_retracted', 'is_paratext', 'has_fulltext',
+]
+
+# Identify ourselves for OpenAlex's polite pool and retry rate-limited pages;
+# load .env first, since this runs at import time, before db_connection loads it
+load_dotenv()
+pyalex.config.email = pyalex.config.email or os.getenv('OPENALEX_EMAIL')
+pyalex.config.max_retries = max(pyalex.config.max_retries, 3)
+
 
 def get_ai_identifiers():
     """Get AI-related identifiers for filtering papers by topics."""
@@ -28,8 +58,42 @@ def get_ai_identifiers():
     return ai_subfield_id
 
 
-def get_recent_ai_papers(ai_subfield_id, days=3):
-    """Get AI papers from the last N days using direct API filtering."""
+def build_works_query(ai_subfield_id, start_date_str, end_date_str, full_records=False):
+    """
+    Build the Works query for AI papers in the given publication date range.
+    
+    Only WORK_FIELDS are requested unless full_records is set (e.g. for
+    debugging or inspecting fields the ETL doesn't use yet).
+    """
+    works_query = pyalex.Works().filter(
+        **{'topics.subfield.id': ai_subfield_id},
+        from_publication_date=start_date_str,
+        to_publication_date=end_date_str
+    )
+    return works_query if full_records else works_query.select(WORK_FIELDS)
+
+
+def fetch_page(ai_subfield_id, start_date_str, end_date_str, page_num, full_records=False):
+    """Fetch one page of results; builds its own query since get() mutates it."""
+    works_query = build_works_query(ai_subfield_id, start_date_str, end_date_str, full_records)
+    return works_query.get(page=page_num, per_page=PER_PAGE)
+
+
+def get_recent_ai_papers(ai_subfield_id, days=3, full_records=False):
+    """
+    Get AI papers from the last N days using direct API filtering.
+    
+    Pages are fetched concurrently but yielded in page order as soon as each
+    one is ready, so callers can write them out while later pages download.
+    
+    Args:
+        ai_subfield_id: OpenAlex subfield ID to filter on
+        days: Number of days to look back
+        full_records: Fetch complete Work records instead of WORK_FIELDS
+        
+    Yields:
+        list: One page of paper records
+    """
     print(f"\n🗓️ Searching for AI papers from the last {days} days...")
     
     # Calculate date range (last N days)
@@ -44,48 +108,68 @@ def get_recent_ai_papers(ai_subfield_id, days=3):
     
     # Filter directly by AI subfield using the API
     print("🎯 Filtering by AI subfield using direct API filtering...")
-    works_query = pyalex.Works().filter(
-        **{'topics.subfield.id': ai_subfield_id},
-        from_publication_date=start_date_str,
-        to_publication_date=end_date_str
-    )
+    works_query = build_works_query(ai_subfield_id, start_date_str, end_date_str, full_records)
     
     # Check total count
     total_count = works_query.count()
     print(f"📊 AI papers available: {total_count}")
     
-    # Get all results using pagination
+    if total_count == 0:
+        return
+    
+    # Get all results using concurrent page requests
     print("📥 Fetching all papers (this may take a moment)...")
-    all_papers = []
-    per_page = 200  # Maximum allowed by OpenAlex
+    fetched = 0
+    
+    # Safety check to prevent excessive API calls
+    total_pages = math.ceil(total_count / PER_PAGE)
+    if total_pages > MAX_PAGES:
+        print("⚠️ Reached maximum page limit, stopping")
+        total_pages = MAX_PAGES
     
     try:
-        # Create paginator and iterate through all pages
-        paginator = works_query.paginate(per_page=per_page)
-        
-        for page_num, page_results in enumerate(paginator, 1):
-            all_papers.extend(page_results)
-            print(f"  📄 Page {page_num}: fetched {len(page_results)} papers (total: {len(all_papers)})")
+        # The page count is known upfront, so overlap the HTTP round trips
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+            futures = [
+                executor.submit(fetch_page, ai_subfield_id, start_date_str, end_date_str, page_num, full_records)
+                for page_num in range(1, total_pages + 1)
+            ]
             
-            # Safety check to prevent excessive API calls
-            if page_num >= 50:  # Reasonable upper limit for ~10,000 papers
-                print("⚠️ Reached maximum page limit, stopping")
-                break
+            for page_num, future in enumerate(futures, 1):
+                page_results = future.result()
+                fetched += len(page_results)
+                logger.info(f"  📄 Page {page_num}: fetched {len(page_results)} papers (total: {fetched})")
+                yield page_results
         
-        print(f"✅ Successfully fetched {len(all_papers)} papers ({len(all_papers)/total_count*100:.1f}% of total)")
+        print(f"✅ Successfully fetched {fetched} papers ({fetched/total_count*100:.1f}% of total)")
         
     except Exception as e:
         print(f"⚠️ Error during pagination: {e}")
+        if fetched:
+            # Pages already handed out can't be taken back; keep what we have
+            print(f"⚠️ Stopping early with {fetched} papers")
+            return
         print("🔄 Falling back to single page fetch...")
         # Fallback to simple get() if pagination fails
-        all_papers = works_query.get()
-        print(f"📄 Fallback: fetched {len(all_papers)} papers")
-    
-    return all_papers
+        page_results = works_query.get()
+        print(f"📄 Fallback: fetched {len(page_results)} papers")
+        yield page_results
 
 
-def save_papers_to_json(papers):
-    """Save papers to a timestamped JSON file in temp/ folder."""
+def save_papers_to_json(pages):
+    """
+    Save papers to a timestamped JSON file in temp/ folder.
+    
+    Papers are written as they arrive, one per line, and the metadata is
+    written last once the total is known. The first papers are kept aside
+    during the same pass for print_paper_summary.
+    
+    Args:
+        pages: Iterable of paper pages (lists of paper records)
+        
+    Returns:
+        tuple: (file path, number of papers saved, first 5 papers)
+    """
     # Create timestamp for filename
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     filename = f"ai_field_subfield_papers_{timestamp}.json"
@@ -99,36 +183,53 @@ def save_papers_to_json(papers):
     
     print(f"\n💾 Saving papers to: {file_path}")
     
-    # Prepare data for JSON serialization
-    output_data = {
-        'metadata': {
+    # Save to JSON file: still one {"papers", "metadata"} document, but each
+    # paper is encoded separately with orjson and written on its own line
+    total_papers = 0
+    summary = []
+    with open(file_path, 'wb') as f:
+        f.write(b'{"papers":[')
+        for page in pages:
+            for paper in page:
+                f.write(b'\n' if total_papers == 0 else b',\n')
+                f.write(orjson.dumps(paper))
+                if total_papers < 5:
+                    summary.append(paper)
+                total_papers += 1
+        
+        # Metadata goes last, once the total is known
+        metadata = {
             'timestamp': datetime.now().isoformat(),
-            'total_papers': len(papers),
+            'total_papers': total_papers,
             'date_range_days': 3,
             'filter_criteria': 'Papers where Artificial Intelligence is the subfield (topics.subfield.id=1702)',
             'ai_subfield_id': '1702',
             'ai_subfield_full_id': 'https://openalex.org/subfields/1702',
             'source': 'OpenAlex API - Direct Filtering'
-        },
-        'papers': papers
-    }
-    
-    # Save to JSON file
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, indent=2, ensure_ascii=False)
+        }
+        f.write(b'\n],\n"metadata":' + orjson.dumps(metadata) + b'}\n')
     
-    print(f"✅ Successfully saved {len(papers)} papers to {file_path}")
+    print(f"✅ Successfully saved {total_papers} papers to {file_path}")
     
-    return str(file_path)
+    return str(file_path), total_papers, summary
 
 
-def print_paper_summary(papers):
-    """Print a summary of the found papers."""
+def print_paper_summary(papers, total_papers=None):
+    """
+    Print a summary of the found papers.
+    
+    Args:
+        papers: Papers to show (only the first 5 are printed)
+        total_papers: Total number of papers found, if more than len(papers)
+    """
     if not papers:
         print("\n❌ No papers found")
         return
     
-    print(f"\n📊 Summary of {len(papers)} papers:")
+    if total_papers is None:
+        total_papers = len(papers)
+    
+    print(f"\n📊 Summary of {total_papers} papers:")
     print("-" * 50)
     
     for i, paper in enumerate(papers[:5], 1):  # Show first 5 papers
@@ -148,8 +249,8 @@ def print_paper_summary(papers):
         print(f"   Venue: {venue}")
         print()
     
-    if len(papers) > 5:
-        print(f"... and {len(papers) - 5} more papers")
+    if total_papers > 5:
+        print(f"... and {total_papers - 5} more papers")
 
 
 def main():
@@ -162,12 +263,13 @@ def main():
         ai_subfield_id = get_ai_identifiers()
         
         # Step 2: Get recent AI papers (filtered by field/subfield)
-        papers = get_recent_ai_papers(ai_subfield_id, days=3)
+        pages = get_recent_ai_papers(ai_subfield_id, days=3)
+        first_page = next(pages, [])
         
-        # Step 3: Save to JSON
-        if papers:
-            file_path = save_papers_to_json(papers)
-            print_paper_summary(papers)
+        # Step 3: Stream to JSON, collecting the summary papers on the way
+        if first_page:
+            file_path, total_papers, summary = save_papers_to_json(chain([first_page], pages))
+            print_paper_summary(summary, total_papers)
         else:
             print("\n❌ No papers found with AI as field/subfield in the last 3 days")
             
@@ -180,4 +282,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Per-page progress goes through logging so it can be silenced by level
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
     exit(main())
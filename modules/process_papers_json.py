@@ -3,22 +3,33 @@
 Script to process JSON data from OpenAlex API and insert papers into the database.
 
 This script:
-1. Loads JSON data from a specified filepath
+1. Streams JSON / JSONL data from a specified filepath
 2. Connects to the database using db_connection.py
 3. Creates papers table if necessary using create_papers_table.py
 4. Processes the data for the papers table
-5. Inserts the data with deduplication
+5. Upserts the data with deduplication
 """
 
-import json
+import hashlib
+import io
 import logging
+import os
 import argparse
+import queue
+import threading
+from collections import namedtuple
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from types import MappingProxyType
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Any, Optional, Tuple
+import ijson
+import orjson
+import zstandard
 import psycopg2
+from psycopg2.extras import execute_values
 
-from .db_connection import get_database_connection, close_connection
-from .create_papers_table import create_papers_table, check_table_exists
+from .db_connection import get_database_connection, close_connection, apply_session_settings, BULK_LOAD_SETTINGS
+from .create_papers_table import create_papers_table, finalize_papers_table, check_table_exists, refresh_papers_views, bulk_load_papers, bulk_load_papers_by_row
 
 # Configure logging
 logging.basicConfig(
@@ -27,44 +38,128 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# JSON documents up to this size are parsed in one go rather than streamed
+IN_MEMORY_PARSE_LIMIT = 64 * 1024 * 1024
 
-def load_json_data(filepath: str) -> Dict[str, Any]:
+# Transformed batches buffered between the parser thread and the loader
+BATCH_QUEUE_SIZE = 4
+
+# Guards each batch inside a multi-batch transaction
+BATCH_SAVEPOINT = 'papers_batch'
+
+# papers columns written by this script, in row order
+PAPER_FIELDS = (
+    'id', 'doi', 'title', 'display_name', 'publication_year', 'publication_date',
+    'created_date', 'updated_date', 'language', 'paper_type', 'type_crossref',
+    'is_open_access', 'oa_status', 'oa_url', 'cited_by_count', 'referenced_works_count',
+    'authors_count', 'countries_distinct_count', 'institutions_distinct_count',
+    'citation_normalized_percentile', 'is_in_top_1_percent', 'is_in_top_10_percent',
+    'journal_name', 'journal_issn', 'journal_is_oa', 'journal_is_indexed_scopus',
+    'journal_is_core', 'journal_host_organization', 'primary_topic_name',
+    'primary_topic_score', 'primary_subfield_name', 'primary_field_name',
+    'primary_domain_name', 'is_retracted', 'is_paratext', 'has_fulltext'
+)
+
+# Stand-in for a missing nested object in transform_paper_data (read-only,
+# shared, so a missing field costs no allocation)
+_EMPTY = MappingProxyType({})
+
+# A transformed paper: a plain tuple in PAPER_FIELDS order (so it goes to
+# execute_values / COPY as is) that still allows access by column name
+PaperRow = namedtuple('PaperRow', PAPER_FIELDS)
+
+# Columns refreshed when a paper is already present
+UPSERT_SET_CLAUSE = """
+    updated_at = CURRENT_TIMESTAMP,
+    title = EXCLUDED.title,
+    display_name = EXCLUDED.display_name,
+    publication_year = EXCLUDED.publication_year,
+    publication_date = EXCLUDED.publication_date,
+    cited_by_count = EXCLUDED.cited_by_count,
+    referenced_works_count = EXCLUDED.referenced_works_count,
+    authors_count = EXCLUDED.authors_count,
+    countries_distinct_count = EXCLUDED.countries_distinct_count,
+    institutions_distinct_count = EXCLUDED.institutions_distinct_count,
+    citation_normalized_percentile = EXCLUDED.citation_normalized_percentile,
+    is_in_top_1_percent = EXCLUDED.is_in_top_1_percent,
+    is_in_top_10_percent = EXCLUDED.is_in_top_10_percent
+"""
+
+# Multi-row upsert; execute_values expands the single %s into (...), (...), ...
+# xmax = 0 marks freshly inserted rows (updated ones carry the updating xid),
+# so inserted and updated counts come back as a single row
+INSERT_PAPERS_SQL = f"""
+WITH merged AS (
+    INSERT INTO papers ({', '.join(PAPER_FIELDS)})
+    VALUES %s
+    ON CONFLICT (id) DO UPDATE SET{UPSERT_SET_CLAUSE}
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted)
+FROM merged"""
+
+
+def iter_papers(filepath: str) -> Iterator[Dict[str, Any]]:
     """
-    Load JSON data from the specified filepath.
+    Stream papers from the specified filepath one at a time.
+    
+    Accepts the find_ai_papers output ({"papers": [...], "metadata": {...}})
+    and the pipeline's JSONL backups (.jsonl, or zstd-compressed .jsonl.zst)
+    with one paper per line. JSONL is decoded line by line. A JSON document
+    up to IN_MEMORY_PARSE_LIMIT bytes is parsed in one orjson call, which is
+    several times faster than event-by-event parsing; larger ones are parsed
+    incrementally with ijson so memory stays flat.
     
     Args:
-        filepath: Path to the JSON file
+        filepath: Path to the JSON / JSONL file
         
-    Returns:
-        Dictionary containing the JSON data
+    Yields:
+        Paper data dictionaries
         
     Raises:
         FileNotFoundError: If the file doesn't exist
-        json.JSONDecodeError: If the JSON is invalid
+        ijson.JSONError / orjson.JSONDecodeError: If the JSON is invalid
     """
+    logger.info(f"Streaming papers from: {filepath}")
+    
     try:
-        logger.info(f"Loading JSON data from: {filepath}")
-        with open(filepath, 'r', encoding='utf-8') as file:
-            data = json.load(file)
-        
-        logger.info(f"✅ Successfully loaded {len(data.get('papers', []))} papers from JSON")
-        return data
-        
+        with open(filepath, 'rb') as file:
+            if filepath.endswith('.jsonl.zst'):
+                with zstandard.ZstdDecompressor().stream_reader(file) as reader:
+                    for line in io.BufferedReader(reader):
+                        if line.strip():
+                            yield orjson.loads(line)
+            elif filepath.endswith('.jsonl'):
+                for line in file:
+                    if line.strip():
+                        yield orjson.loads(line)
+            elif os.fstat(file.fileno()).st_size <= IN_MEMORY_PARSE_LIMIT:
+                yield from orjson.loads(file.read()).get('papers') or []
+            else:
+                # ijson picks its fastest available backend (yajl2_c when built)
+                yield from ijson.items(file, 'papers.item', use_float=True)
+    
     except FileNotFoundError:
         logger.error(f"❌ File not found: {filepath}")
         raise
-    except json.JSONDecodeError as e:
+    except (ijson.JSONError, orjson.JSONDecodeError) as e:
         logger.error(f"❌ Invalid JSON format: {e}")
         raise
-    except Exception as e:
-        logger.error(f"❌ Error loading JSON file: {e}")
-        raise
+
+
+def iter_batches(papers: Iterable[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group a paper stream into lists of at most batch_size papers."""
+    papers = iter(papers)
+    while batch := list(islice(papers, batch_size)):
+        yield batch
 
 
 def extract_paper_id(paper: Dict[str, Any]) -> str:
     """
     Extract the unique paper ID from the paper data.
     
+    Shared by pipeline.py, so both loaders assign the same ids.
+    
     Args:
         paper: Paper data dictionary
         
@@ -79,11 +174,40 @@ def extract_paper_id(paper: Dict[str, Any]) -> str:
     elif paper.get('ids', {}).get('openalex'):
         return paper['ids']['openalex']
     else:
-        # Generate a fallback ID if none exists
-        return f"fallback_{hash(str(paper))}"
+        # Generate a fallback ID if none exists from the whole record, serialized
+        # with sorted keys so it is stable across runs (unlike hash()). Hashing
+        # only a few fields would merge distinct papers that share them.
+        key = orjson.dumps(paper, option=orjson.OPT_SORT_KEYS)
+        return f"fallback_{hashlib.blake2b(key, digest_size=12).hexdigest()}"
 
 
-def transform_paper_data(paper: Dict[str, Any]) -> Dict[str, Any]:
+def count_author_reach(paper: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    Count distinct author countries and institutions in a single pass.
+    
+    Args:
+        paper: Paper data from OpenAlex API
+        
+    Returns:
+        Tuple of (distinct country codes, distinct institution IDs)
+    """
+    countries = set()
+    institutions = set()
+    for author in paper.get('authorships') or []:
+        if not author:
+            continue
+        country_code = author.get('country_code')
+        if country_code:
+            countries.add(country_code)
+        for inst in author.get('institutions') or []:
+            if inst:
+                inst_id = inst.get('id')
+                if inst_id:
+                    institutions.add(inst_id)
+    return len(countries), len(institutions)
+
+
+def transform_paper_data(paper: Dict[str, Any]) -> PaperRow:
     """
     Transform paper data from OpenAlex format to database schema format.
     
@@ -91,240 +215,313 @@ def transform_paper_data(paper: Dict[str, Any]) -> Dict[str, Any]:
         paper: Paper data from OpenAlex API
         
     Returns:
-        Transformed paper data for database insertion
+        Transformed paper row for database insertion
     """
     # Extract basic information
     paper_id = extract_paper_id(paper)
     
     # Extract source/journal information with safe navigation
-    primary_location = paper.get('primary_location') or {}
-    source = primary_location.get('source') or {}
+    primary_location = paper.get('primary_location') or _EMPTY
+    source = primary_location.get('source') or _EMPTY
     
     # Extract topic information (flattened) with safe navigation
-    topics = paper.get('topics') or []
-    primary_topic = topics[0] if topics else {}
-    subfield = primary_topic.get('subfield') or {}
-    field = primary_topic.get('field') or {}
-    domain = primary_topic.get('domain') or {}
+    topics = paper.get('topics')
+    primary_topic = (topics[0] if topics else None) or _EMPTY
+    subfield = primary_topic.get('subfield') or _EMPTY
+    field = primary_topic.get('field') or _EMPTY
+    domain = primary_topic.get('domain') or _EMPTY
     
     # Extract citation metrics with safe navigation
-    citation_metrics = paper.get('citation_metrics') or {}
+    citation_metrics = paper.get('citation_metrics') or _EMPTY
     
     # Extract authorships with safe navigation
-    authorships = paper.get('authorships') or []
-    referenced_works = paper.get('referenced_works') or []
+    authorships = paper.get('authorships') or ()
+    referenced_works = paper.get('referenced_works') or ()
+    countries_distinct_count, institutions_distinct_count = count_author_reach(paper)
     
     # Transform the data with safe navigation
-    transformed = {
-        'id': paper_id,
-        'doi': paper.get('doi'),
-        'title': paper.get('title') or paper.get('display_name'),
-        'display_name': paper.get('display_name'),
+    return PaperRow(
+        id=paper_id,
+        doi=paper.get('doi'),
+        title=paper.get('title') or paper.get('display_name'),
+        display_name=paper.get('display_name'),
         
         # Temporal data
-        'publication_year': paper.get('publication_year'),
-        'publication_date': paper.get('publication_date'),
-        'created_date': paper.get('created_date'),
-        'updated_date': paper.get('updated_date'),
+        publication_year=paper.get('publication_year'),
+        publication_date=paper.get('publication_date'),
+        created_date=paper.get('created_date'),
+        updated_date=paper.get('updated_date'),
         
         # Basic metadata
-        'language': paper.get('language'),
-        'paper_type': paper.get('type'),
-        'type_crossref': paper.get('type_crossref'),
+        language=paper.get('language'),
+        paper_type=paper.get('type'),
+        type_crossref=paper.get('type_crossref'),
         
         # Open Access information
-        'is_open_access': primary_location.get('is_oa'),
-        'oa_status': primary_location.get('oa_status'),
-        'oa_url': primary_location.get('pdf_url'),
+        is_open_access=primary_location.get('is_oa'),
+        oa_status=primary_location.get('oa_status'),
+        oa_url=primary_location.get('pdf_url'),
         
         # Quantitative measures
-        'cited_by_count': paper.get('cited_by_count', 0),
-        'referenced_works_count': len(referenced_works),
-        'authors_count': len(authorships),
-        'countries_distinct_count': len(set(
-            author.get('country_code') 
-            for author in authorships
-            if author and author.get('country_code')
-        )),
-        'institutions_distinct_count': len(set(
-            inst.get('id')
-            for author in authorships
-            if author and author.get('institutions')
-            for inst in author.get('institutions') or []
-            if inst and inst.get('id')
-        )),
+        cited_by_count=paper.get('cited_by_count', 0),
+        referenced_works_count=len(referenced_works),
+        authors_count=len(authorships),
+        countries_distinct_count=countries_distinct_count,
+        institutions_distinct_count=institutions_distinct_count,
         
         # Citation metrics
-        'citation_normalized_percentile': citation_metrics.get('normalized_percentile'),
-        'is_in_top_1_percent': citation_metrics.get('is_in_top_1_percent', False),
-        'is_in_top_10_percent': citation_metrics.get('is_in_top_10_percent', False),
+        citation_normalized_percentile=citation_metrics.get('normalized_percentile'),
+        is_in_top_1_percent=citation_metrics.get('is_in_top_1_percent', False),
+        is_in_top_10_percent=citation_metrics.get('is_in_top_10_percent', False),
         
         # Source/Journal information
-        'journal_name': source.get('display_name'),
-        'journal_issn': source.get('issn_l'),
-        'journal_is_oa': source.get('is_oa'),
-        'journal_is_indexed_scopus': source.get('is_indexed_in_scopus'),
-        'journal_is_core': source.get('is_core'),
-        'journal_host_organization': source.get('host_organization_name'),
+        journal_name=source.get('display_name'),
+        journal_issn=source.get('issn_l'),
+        journal_is_oa=source.get('is_oa'),
+        journal_is_indexed_scopus=source.get('is_indexed_in_scopus'),
+        journal_is_core=source.get('is_core'),
+        journal_host_organization=source.get('host_organization_name'),
         
         # Topic classification (flattened)
-        'primary_topic_name': primary_topic.get('display_name'),
-        'primary_topic_score': primary_topic.get('score'),
-        'primary_subfield_name': subfield.get('display_name'),
-        'primary_field_name': field.get('display_name'),
-        'primary_domain_name': domain.get('display_name'),
+        primary_topic_name=primary_topic.get('display_name'),
+        primary_topic_score=primary_topic.get('score'),
+        primary_subfield_name=subfield.get('display_name'),
+        primary_field_name=field.get('display_name'),
+        primary_domain_name=domain.get('display_name'),
         
         # Additional metadata
-        'is_retracted': paper.get('is_retracted', False),
-        'is_paratext': paper.get('is_paratext', False),
-        'has_fulltext': paper.get('has_fulltext', False),
-    }
-    
-    return transformed
+        is_retracted=paper.get('is_retracted', False),
+        is_paratext=paper.get('is_paratext', False),
+        has_fulltext=paper.get('has_fulltext', False),
+    )
 
 
-def check_paper_exists(connection: psycopg2.extensions.connection, paper_id: str) -> bool:
+def insert_papers(connection: psycopg2.extensions.connection, papers: List[PaperRow],
+                  savepoint: Optional[str] = None) -> Tuple[int, int]:
     """
-    Check if a paper already exists in the database.
+    Upsert a batch of papers into the database with one multi-row INSERT.
+    
+    The batch is sent as a single statement (one execute_values page), so
+    an optional savepoint can be set in the same round trip and guard the
+    whole batch; it is released once the papers are written.
     
     Args:
         connection: Database connection
-        paper_id: Paper ID to check
+        papers: Transformed paper data (unique ids)
+        savepoint: Optional savepoint name guarding this batch
         
     Returns:
-        True if paper exists, False otherwise
+        Tuple of (inserted, updated) paper counts
     """
+    if not papers:
+        return 0, 0
+    
+    set_savepoint = f"SAVEPOINT {savepoint}; " if savepoint else ""
+    
+    cursor = connection.cursor()
     try:
-        cursor = connection.cursor()
-        cursor.execute("SELECT 1 FROM papers WHERE id = %s", (paper_id,))
-        exists = cursor.fetchone() is not None
+        counts = execute_values(
+            cursor, set_savepoint + INSERT_PAPERS_SQL, papers,
+            page_size=len(papers), fetch=True
+        )
+        if savepoint:
+            cursor.execute(f"RELEASE SAVEPOINT {savepoint};")
+    finally:
         cursor.close()
-        return exists
-    except Exception as e:
-        logger.error(f"❌ Error checking if paper exists: {e}")
-        return False
+    
+    inserted, updated = counts[0]
+    return inserted, updated
 
 
-def insert_paper(connection: psycopg2.extensions.connection, paper_data: Dict[str, Any]) -> bool:
+def transform_papers(papers: List[Dict[str, Any]]) -> Tuple[List[PaperRow], int]:
     """
-    Insert a single paper into the database.
+    Transform a batch of papers to database schema format.
     
     Args:
-        connection: Database connection
-        paper_data: Transformed paper data
+        papers: List of paper data
         
     Returns:
-        True if insertion successful, False otherwise
-    """
-    # Prepare the SQL statement with all fields
-    fields = [
-        'id', 'doi', 'title', 'display_name', 'publication_year', 'publication_date',
-        'created_date', 'updated_date', 'language', 'paper_type', 'type_crossref',
-        'is_open_access', 'oa_status', 'oa_url', 'cited_by_count', 'referenced_works_count',
-        'authors_count', 'countries_distinct_count', 'institutions_distinct_count',
-        'citation_normalized_percentile', 'is_in_top_1_percent', 'is_in_top_10_percent',
-        'journal_name', 'journal_issn', 'journal_is_oa', 'journal_is_indexed_scopus',
-        'journal_is_core', 'journal_host_organization', 'primary_topic_name',
-        'primary_topic_score', 'primary_subfield_name', 'primary_field_name',
-        'primary_domain_name', 'is_retracted', 'is_paratext', 'has_fulltext'
-    ]
-    
-    # Create placeholders for the SQL statement
-    placeholders = ', '.join(['%s'] * len(fields))
-    field_names = ', '.join(fields)
-    
-    sql = f"""
-    INSERT INTO papers ({field_names})
-    VALUES ({placeholders})
-    ON CONFLICT (id) DO UPDATE SET
-        updated_at = CURRENT_TIMESTAMP,
-        title = EXCLUDED.title,
-        display_name = EXCLUDED.display_name,
-        publication_year = EXCLUDED.publication_year,
-        publication_date = EXCLUDED.publication_date,
-        cited_by_count = EXCLUDED.cited_by_count,
-        referenced_works_count = EXCLUDED.referenced_works_count,
-        authors_count = EXCLUDED.authors_count,
-        countries_distinct_count = EXCLUDED.countries_distinct_count,
-        institutions_distinct_count = EXCLUDED.institutions_distinct_count,
-        citation_normalized_percentile = EXCLUDED.citation_normalized_percentile,
-        is_in_top_1_percent = EXCLUDED.is_in_top_1_percent,
-        is_in_top_10_percent = EXCLUDED.is_in_top_10_percent
+        Tuple of (transformed papers, number of papers that failed to transform)
     """
-    
-    try:
-        cursor = connection.cursor()
-        
-        # Prepare values in the correct order
-        values = [paper_data.get(field) for field in fields]
-        
-        cursor.execute(sql, values)
-        cursor.close()
-        return True
-        
-    except Exception as e:
-        logger.error(f"❌ Error inserting paper {paper_data.get('id', 'unknown')}: {e}")
-        return False
+    transformed_papers = []
+    errors = 0
+    for i, paper in enumerate(papers, 1):
+        try:
+            transformed_papers.append(transform_paper_data(paper))
+        except Exception as e:
+            logger.error(f"❌ Error processing paper {i}: {e}")
+            errors += 1
+    return transformed_papers, errors
 
 
-def process_papers_batch(connection: psycopg2.extensions.connection, papers: List[Dict[str, Any]]) -> Dict[str, int]:
+def load_papers_batch(connection: psycopg2.extensions.connection, transformed_papers: List[PaperRow],
+                      use_copy: bool = False) -> Dict[str, int]:
     """
-    Process a batch of papers and insert them into the database.
+    Upsert a batch of transformed papers into the database.
+    
+    The batch is upserted in one statement; ON CONFLICT (id) DO UPDATE
+    refreshes papers that already exist, so no separate existence check is
+    needed. With use_copy the batch is instead streamed through COPY into a
+    staging table and merged (see bulk_load_papers); if the server rejects
+    that COPY the batch is retried row by row, so only the failing rows count
+    as errors. The database work runs under a savepoint, so a failing batch is
+    rolled back without losing earlier batches of the same transaction. The
+    caller commits.
     
     Args:
         connection: Database connection
-        papers: List of paper data
+        transformed_papers: Transformed paper data
+        use_copy: Load via COPY + merge instead of INSERT
         
     Returns:
         Dictionary with processing statistics
     """
+    total = len(transformed_papers)
     stats = {
-        'total': len(papers),
+        'total': total,
         'inserted': 0,
         'updated': 0,
         'skipped': 0,
         'errors': 0
     }
     
-    logger.info(f"Processing batch of {len(papers)} papers...")
+    if not total:
+        return stats
     
-    for i, paper in enumerate(papers, 1):
-        try:
-            # Transform the paper data
-            transformed_paper = transform_paper_data(paper)
-            
-            # Check if paper already exists
-            if check_paper_exists(connection, transformed_paper['id']):
-                stats['skipped'] += 1
-                if i % 100 == 0:
-                    logger.info(f"Progress: {i}/{len(papers)} papers processed (skipped: {stats['skipped']})")
-                continue
-            
-            # Insert the paper
-            if insert_paper(connection, transformed_paper):
-                stats['inserted'] += 1
-            else:
-                stats['errors'] += 1
-            
-            # Log progress every 100 papers
-            if i % 100 == 0:
-                logger.info(f"Progress: {i}/{len(papers)} papers processed (inserted: {stats['inserted']}, errors: {stats['errors']})")
-                
-        except Exception as e:
-            logger.error(f"❌ Error processing paper {i}: {e}")
-            stats['errors'] += 1
+    # A single upsert cannot touch the same id twice, so keep the last copy;
+    # both load paths see the same rows and report duplicates as skipped
+    unique_papers = list({paper.id: paper for paper in transformed_papers}.values())
+    
+    try:
+        if use_copy:
+            stats['inserted'], stats['updated'] = bulk_load_papers(
+                connection, unique_papers, PAPER_FIELDS, return_counts=True,
+                savepoint=BATCH_SAVEPOINT
+            )
+        else:
+            stats['inserted'], stats['updated'] = insert_papers(
+                connection, unique_papers, savepoint=BATCH_SAVEPOINT
+            )
+        stats['skipped'] = total - len(unique_papers)
+    
+    except psycopg2.Error as e:
+        with connection.cursor() as cursor:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {BATCH_SAVEPOINT};")
+        
+        if not use_copy:
+            logger.error(f"❌ Error loading papers: {e}")
+            stats['inserted'] = stats['updated'] = stats['skipped'] = 0
+            stats['errors'] += total
+            return stats
+        
+        # One bad row fails the whole COPY; retry row by row so only it is lost
+        logger.warning(f"⚠️ Batch COPY failed, retrying row by row: {e}")
+        stats['inserted'], stats['updated'], failed = bulk_load_papers_by_row(
+            connection, unique_papers, PAPER_FIELDS, BATCH_SAVEPOINT
+        )
+        stats['skipped'] = total - len(unique_papers)
+        stats['errors'] += failed
     
     return stats
 
 
+def process_papers_batch(connection: psycopg2.extensions.connection, papers: List[Dict[str, Any]],
+                         use_copy: bool = False) -> Dict[str, int]:
+    """
+    Process a batch of papers and insert them into the database.
+    
+    Args:
+        connection: Database connection
+        papers: List of paper data
+        use_copy: Load via COPY + merge instead of INSERT
+        
+    Returns:
+        Dictionary with processing statistics
+    """
+    transformed_papers, errors = transform_papers(papers)
+    stats = load_papers_batch(connection, transformed_papers, use_copy=use_copy)
+    stats['total'] = len(papers)
+    stats['errors'] += errors
+    return stats
+
+
+def produce_batches(papers: Iterable[Dict[str, Any]], batch_size: int,
+                    batch_queue: queue.Queue, stop: threading.Event) -> None:
+    """
+    Parse and transform papers into batches (runs on the producer thread).
+    
+    Args:
+        papers: Iterable of raw paper data
+        batch_size: Papers per batch
+        batch_queue: Bounded queue shared with the loader
+        stop: Set by the consumer when it gives up early
+    """
+    try:
+        for batch in iter_batches(papers, batch_size):
+            if stop.is_set():
+                return
+            transformed_papers, errors = transform_papers(batch)
+            batch_queue.put((len(batch), transformed_papers, errors))
+    except Exception as e:
+        # Hand the failure to the consumer so it surfaces in the main thread
+        batch_queue.put(e)
+    finally:
+        batch_queue.put(None)
+
+
+def iter_transformed_batches(papers: Iterable[Dict[str, Any]],
+                             batch_size: int) -> Iterator[Tuple[int, List[PaperRow], int]]:
+    """
+    Parse and transform papers on a background thread while the caller loads them.
+    
+    JSON parsing and the transform are CPU work, loading is mostly waiting
+    on the database (psycopg2 releases the GIL there), so running them on
+    separate threads hides one behind the other. The queue bound keeps at
+    most BATCH_QUEUE_SIZE batches in memory if the database falls behind.
+    
+    Args:
+        papers: Iterable of raw paper data
+        batch_size: Papers per batch
+        
+    Yields:
+        Tuples of (papers in batch, transformed papers, transform errors), in order
+    """
+    batch_queue = queue.Queue(maxsize=BATCH_QUEUE_SIZE)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=produce_batches, args=(papers, batch_size, batch_queue, stop),
+        name="papers-parse", daemon=True
+    )
+    producer.start()
+    
+    try:
+        while (batch := batch_queue.get()) is not None:
+            if isinstance(batch, Exception):
+                raise batch
+            yield batch
+    finally:
+        # Unblock the producer if the consumer stopped before the end
+        stop.set()
+        while producer.is_alive():
+            try:
+                batch_queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
 def main():
     """
     Main function to process JSON papers data and insert into database.
     """
     parser = argparse.ArgumentParser(description='Process JSON papers data and insert into database')
-    parser.add_argument('json_filepath', help='Path to the JSON file containing papers data')
-    parser.add_argument('--batch-size', type=int, default=100, help='Batch size for processing (default: 100)')
+    parser.add_argument('json_filepath', help='Path to the JSON or JSONL (.jsonl / .jsonl.zst) file containing papers data')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Batch size for processing (default: 1000)')
+    parser.add_argument('--commit-every', type=int, default=10, help='Commit after this many batches (default: 10)')
     parser.add_argument('--force', action='store_true', help='Force recreation of papers table')
+    parser.add_argument('--use-copy', '--staging', dest='use_copy', action='store_true',
+                        help='Bulk load with COPY into a staging table instead of INSERT')
+    parser.add_argument('--first-load', action='store_true',
+                        help='Create a missing papers table UNLOGGED and build its indexes after the load')
     
     args = parser.parse_args()
     
@@ -332,13 +529,14 @@ def main():
     print("=" * 70)
     
     try:
-        # Load JSON data
-        data = load_json_data(args.json_filepath)
-        papers = data.get('papers', [])
+        # Stream the papers; peek so an empty file is caught before connecting
+        papers = iter_papers(args.json_filepath)
+        first_paper = next(papers, None)
         
-        if not papers:
+        if first_paper is None:
             logger.error("❌ No papers found in the JSON data")
             return
+        papers = chain([first_paper], papers)
         
         # Get database connection
         logger.info("Connecting to database...")
@@ -350,49 +548,81 @@ def main():
         
         try:
             # Check if papers table exists
-            if not check_table_exists(connection) or args.force:
+            table_exists = check_table_exists(connection)
+            if args.first_load and table_exists:
+                logger.warning("⚠️ Papers table already exists, ignoring --first-load")
+            # Only a brand-new table can skip WAL and index maintenance during the load
+            first_load = args.first_load and not table_exists
+            
+            if not table_exists or args.force:
                 logger.info("Creating papers table...")
-                if not create_papers_table(connection):
+                if not create_papers_table(connection, for_bulk_load=first_load):
                     logger.error("❌ Failed to create papers table")
                     return
                 logger.info("✅ Papers table created successfully!")
             else:
                 logger.info("✅ Papers table already exists")
             
-            # Process papers in batches
-            total_papers = len(papers)
-            logger.info(f"Processing {total_papers} papers in batches of {args.batch_size}")
+            # Process papers in batches as they are parsed
+            logger.info(f"Processing papers in batches of {args.batch_size}")
             
             overall_stats = {
-                'total': total_papers,
+                'total': 0,
                 'inserted': 0,
                 'updated': 0,
                 'skipped': 0,
                 'errors': 0
             }
             
-            # Process in batches
-            for i in range(0, total_papers, args.batch_size):
-                batch = papers[i:i + args.batch_size]
-                batch_stats = process_papers_batch(connection, batch)
+            # Process in batches, parsing ahead on a background thread
+            batches = iter_transformed_batches(papers, args.batch_size)
+            commit_every = max(1, args.commit_every)
+            for batch_num, (batch_total, transformed_papers, transform_errors) in enumerate(batches, 1):
+                # SET LOCAL lasts one transaction, so reapply it after every commit
+                if (batch_num - 1) % commit_every == 0:
+                    apply_session_settings(connection, BULK_LOAD_SETTINGS, local=True)
+                
+                batch_stats = load_papers_batch(connection, transformed_papers, use_copy=args.use_copy)
                 
                 # Update overall stats
+                overall_stats['total'] += batch_total
                 overall_stats['inserted'] += batch_stats['inserted']
+                overall_stats['updated'] += batch_stats['updated']
                 overall_stats['skipped'] += batch_stats['skipped']
-                overall_stats['errors'] += batch_stats['errors']
+                overall_stats['errors'] += batch_stats['errors'] + transform_errors
                 
-                # Commit after each batch
-                connection.commit()
-                logger.info(f"✅ Batch {i//args.batch_size + 1} completed and committed")
+                # Commit every N batches
+                committed = batch_num % commit_every == 0
+                if committed:
+                    connection.commit()
+                
+                # One progress line per batch
+                logger.info(
+                    f"✅ Batch {batch_num} completed{' and committed' if committed else ''} "
+                    f"({batch_total} papers; inserted: {batch_stats['inserted']}, updated: {batch_stats['updated']}, "
+                    f"skipped: {batch_stats['skipped']}, errors: {batch_stats['errors'] + transform_errors})"
+                )
+            
+            # Commit whatever the last partial group loaded
+            connection.commit()
+            
+            if first_load:
+                # Make the table durable and build the deferred indexes and views
+                if not finalize_papers_table(connection):
+                    logger.error("❌ Failed to finalize papers table, it is still UNLOGGED and missing its indexes")
+            # Refresh the dashboard's materialized views
+            elif not refresh_papers_views(connection):
+                logger.warning("⚠️ Failed to refresh dashboard views, dashboard may show stale data")
             
             # Final summary
             print("\n📊 Processing Summary")
             print("-" * 40)
             print(f"Total papers processed: {overall_stats['total']}")
             print(f"Papers inserted: {overall_stats['inserted']}")
-            print(f"Papers skipped (already exist): {overall_stats['skipped']}")
+            print(f"Papers updated (already exist): {overall_stats['updated']}")
+            print(f"Papers skipped (duplicates in input): {overall_stats['skipped']}")
             print(f"Errors: {overall_stats['errors']}")
-            print(f"Success rate: {((overall_stats['inserted'] + overall_stats['skipped']) / overall_stats['total'] * 100):.1f}%")
+            print(f"Success rate: {((overall_stats['inserted'] + overall_stats['updated'] + overall_stats['skipped']) / overall_stats['total'] * 100):.1f}%")
             
         finally:
             # Close the connection
@@ -12,21 +12,29 @@ Usage:
     python pipeline.py [--days N] [--batch-size N] [--force] [--skip-quality-tests]
 """
 
-import json
+import orjson
+import zstandard
 import logging
 import argparse
-from datetime import datetime, timedelta
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import chain
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterable, Iterator, List
 import psycopg2
 
 # Import existing modules
-from modules.db_connection import get_database_connection, close_connection
-from modules.create_papers_table import create_papers_table, check_table_exists
-from modules.data_quality_tests import DataQualityTester
+from modules.db_connection import get_database_connection, close_connection, apply_session_settings, BULK_LOAD_SETTINGS
+from modules.create_papers_table import create_papers_table, check_table_exists, refresh_papers_views, bulk_load_papers, bulk_load_papers_by_row
+from modules.data_quality_tests import DataQualityTester, write_report
+from modules.process_papers_json import count_author_reach, extract_paper_id
 
-# Import pyalex for API calls
-import pyalex
+# OpenAlex query helpers (also configures pyalex's polite pool and retries)
+from modules.find_ai_papers import build_works_query, fetch_page, PER_PAGE, MAX_PAGES, FETCH_WORKERS
 
 # Configure logging
 logging.basicConfig(
@@ -36,10 +44,143 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+# papers column -> where its value comes from in an OpenAlex record, in row
+# order. A tuple is a path of dict keys / list indexes (optionally followed by
+# a default); a string is a Python expression over `paper`. build_row_function
+# turns the specs into one generated function at import time.
+FIELD_SPECS = [
+    ('id', 'extract_paper_id(paper)'),
+    ('doi', ('doi',)),
+    ('title', "paper.get('title') or paper.get('display_name')"),
+    ('display_name', ('display_name',)),
+    
+    # Temporal data
+    ('publication_year', ('publication_year',)),
+    ('publication_date', ('publication_date',)),
+    ('created_date', ('created_date',)),
+    ('updated_date', ('updated_date',)),
+    
+    # Basic metadata
+    ('language', ('language',)),
+    ('paper_type', ('type',)),
+    ('type_crossref', ('type_crossref',)),
+    
+    # Open Access information
+    ('is_open_access', ('primary_location', 'is_oa')),
+    ('oa_status', ('primary_location', 'oa_status')),
+    ('oa_url', ('primary_location', 'pdf_url')),
+    
+    # Quantitative measures
+    ('cited_by_count', ('cited_by_count',), 0),
+    ('referenced_works_count', "len(paper.get('referenced_works') or ())"),
+    ('authors_count', "len(paper.get('authorships') or ())"),
+    
+    # Citation metrics
+    ('citation_normalized_percentile', ('citation_metrics', 'normalized_percentile')),
+    ('is_in_top_1_percent', ('citation_metrics', 'is_in_top_1_percent'), False),
+    ('is_in_top_10_percent', ('citation_metrics', 'is_in_top_10_percent'), False),
+    
+    # Source/Journal information
+    ('journal_name', ('primary_location', 'source', 'display_name')),
+    ('journal_issn', ('primary_location', 'source', 'issn_l')),
+    ('journal_is_oa', ('primary_location', 'source', 'is_oa')),
+    ('journal_is_indexed_scopus', ('primary_location', 'source', 'is_indexed_in_scopus')),
+    ('journal_is_core', ('primary_location', 'source', 'is_core')),
+    ('journal_host_organization', ('primary_location', 'source', 'host_organization_name')),
+    
+    # Topic classification (flattened, from the first topic)
+    ('primary_topic_name', ('topics', 0, 'display_name')),
+    ('primary_topic_score', ('topics', 0, 'score')),
+    ('primary_subfield_name', ('topics', 0, 'subfield', 'display_name')),
+    ('primary_field_name', ('topics', 0, 'field', 'display_name')),
+    ('primary_domain_name', ('topics', 0, 'domain', 'display_name')),
+    
+    # Additional metadata
+    ('is_retracted', ('is_retracted',), False),
+    ('is_paratext', ('is_paratext',), False),
+    ('has_fulltext', ('has_fulltext',), False),
+]
+
+# Filled by count_author_reach, which walks the authorships once for both
+AUTHOR_REACH_FIELDS = ['countries_distinct_count', 'institutions_distinct_count']
+
+# papers columns loaded by the pipeline, in row order
+PAPER_FIELDS = [spec[0] for spec in FIELD_SPECS] + AUTHOR_REACH_FIELDS
+
+# Stand-in for a missing or empty nested object (read-only, shared)
+_EMPTY = MappingProxyType({})
+
+
+def build_row_function(field_specs) -> Callable[[Dict[str, Any]], tuple]:
+    """
+    Generate a specialised paper -> row function from the field specs.
+    
+    Each nested object on a path (primary_location, its source, the first
+    topic, ...) is looked up once into a local, falling back to an empty
+    mapping when missing, so every column becomes a single .get() on a local
+    instead of a walk from the top of the record. The row is returned as one
+    tuple display followed by the author reach counts.
+    
+    Args:
+        field_specs: Entries of FIELD_SPECS
+        
+    Returns:
+        Function mapping a paper record to a row ordered like PAPER_FIELDS
+    """
+    lines = []
+    parents = {(): 'paper'}
+    
+    def parent(prefix, next_key):
+        # Hoist each distinct path prefix into a local, once
+        if prefix not in parents:
+            outer = parent(prefix[:-1], prefix[-1])
+            key = prefix[-1]
+            name = '_' + '_'.join(str(k) for k in prefix)
+            if isinstance(key, int):
+                value = f"({outer}[{key}] if len({outer}) > {key} else None)"
+            else:
+                value = f"{outer}.get({key!r})"
+            empty = '()' if isinstance(next_key, int) else '_EMPTY'
+            lines.append(f"    {name} = {value} or {empty}")
+            parents[prefix] = name
+        return parents[prefix]
+    
+    values = []
+    for column, source, *default in field_specs:
+        if isinstance(source, str):
+            values.append(source)
+        else:
+            default = default[0] if default else None
+            values.append(f"{parent(source[:-1], source[-1])}.get({source[-1]!r}, {default!r})")
+    
+    code = "def paper_to_row(paper):\n"
+    code += "".join(line + "\n" for line in lines)
+    code += "    return (\n" + "".join(f"        {value},\n" for value in values)
+    code += "    ) + count_author_reach(paper)\n"
+    
+    namespace = {
+        '_EMPTY': _EMPTY,
+        'extract_paper_id': extract_paper_id,
+        'count_author_reach': count_author_reach,
+    }
+    exec(compile(code, '<paper_to_row>', 'exec'), namespace)
+    return namespace['paper_to_row']
+
+
+# Transform an OpenAlex paper straight into a papers row ordered like PAPER_FIELDS
+paper_to_row = build_row_function(FIELD_SPECS)
+
+
 class MarketDataPipeline:
     """Consolidated pipeline class for market data processing."""
     
-    def __init__(self, days: int = 3, batch_size: int = 100, force_recreate: bool = False):
+    PAPER_FIELDS = PAPER_FIELDS
+    
+    # Pages buffered between the fetch thread and the database upload
+    PAGE_QUEUE_SIZE = 4
+    
+    def __init__(self, days: int = 3, batch_size: int = 100, force_recreate: bool = False,
+                 commit_every: int = 5):
         """
         Initialize the pipeline.
         
@@ -47,16 +188,19 @@ class MarketDataPipeline:
             days: Number of days to look back for papers
             batch_size: Batch size for database operations
             force_recreate: Force recreation of papers table
+            commit_every: Number of batches loaded per transaction commit
         """
         self.days = days
         self.batch_size = batch_size
+        self.commit_every = max(1, commit_every)
         self.force_recreate = force_recreate
         self.connection = None
-        self.papers = []
+        # One UTC clock reading per run; date range, file stamps and metadata derive from it
+        self._run_started = datetime.now(timezone.utc)
         self.stats = {
             'papers_fetched': 0,
             'papers_inserted': 0,
-            'papers_skipped': 0,
+            'papers_updated': 0,
             'errors': 0
         }
     
@@ -84,116 +228,200 @@ class MarketDataPipeline:
         
         return ai_subfield_id
     
-    def fetch_recent_papers(self) -> bool:
-        """Fetch recent AI papers from the OpenAlex API."""
+    def fetch_recent_papers(self) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Fetch recent AI papers from the OpenAlex API.
+        
+        Pages are fetched concurrently but yielded in page order as soon as each
+        one is ready, so they can be backed up and uploaded while later pages
+        are still downloading. Nothing is kept once a page has been consumed.
+        
+        Yields:
+            One page of raw OpenAlex paper records
+        """
         logger.info(f"🗓️ Searching for AI papers from the last {self.days} days...")
         
+        # Get AI identifiers
+        ai_subfield_id = self.get_ai_identifiers()
+        
+        # Calculate date range
+        end_date = self._run_started
+        start_date = end_date - timedelta(days=self.days)
+        
+        # Format dates for OpenAlex API (YYYY-MM-DD)
+        start_date_str = start_date.strftime('%Y-%m-%d')
+        end_date_str = end_date.strftime('%Y-%m-%d')
+        
+        logger.info(f"📅 Date range: {start_date_str} to {end_date_str}")
+        
+        # Filter directly by AI subfield using the API
+        logger.info("🎯 Filtering by AI subfield using direct API filtering...")
+        works_query = build_works_query(ai_subfield_id, start_date_str, end_date_str)
+        
+        # Check total count
+        total_count = works_query.count()
+        logger.info(f"📊 AI papers available: {total_count}")
+        
+        if total_count == 0:
+            logger.warning("⚠️ No papers found for the specified criteria")
+            return
+        
+        # Get all results using concurrent page requests
+        logger.info("📥 Fetching all papers (this may take a moment)...")
+        
+        # Safety check to prevent excessive API calls
+        total_pages = math.ceil(total_count / PER_PAGE)
+        if total_pages > MAX_PAGES:
+            logger.warning("⚠️ Reached maximum page limit, stopping")
+            total_pages = MAX_PAGES
+        
         try:
-            # Get AI identifiers
-            ai_subfield_id = self.get_ai_identifiers()
-            
-            # Calculate date range
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=self.days)
-            
-            # Format dates for OpenAlex API (YYYY-MM-DD)
-            start_date_str = start_date.strftime('%Y-%m-%d')
-            end_date_str = end_date.strftime('%Y-%m-%d')
-            
-            logger.info(f"📅 Date range: {start_date_str} to {end_date_str}")
-            
-            # Filter directly by AI subfield using the API
-            logger.info("🎯 Filtering by AI subfield using direct API filtering...")
-            works_query = pyalex.Works().filter(
-                **{'topics.subfield.id': ai_subfield_id},
-                from_publication_date=start_date_str,
-                to_publication_date=end_date_str
-            )
-            
-            # Check total count
-            total_count = works_query.count()
-            logger.info(f"📊 AI papers available: {total_count}")
-            
-            if total_count == 0:
-                logger.warning("⚠️ No papers found for the specified criteria")
-                return True
-            
-            # Get all results using pagination
-            logger.info("📥 Fetching all papers (this may take a moment)...")
-            all_papers = []
-            per_page = 200  # Maximum allowed by OpenAlex
-            
-            try:
-                # Create paginator and iterate through all pages
-                paginator = works_query.paginate(per_page=per_page)
-                
-                for page_num, page_results in enumerate(paginator, 1):
-                    all_papers.extend(page_results)
-                    logger.info(f"  📄 Page {page_num}: fetched {len(page_results)} papers (total: {len(all_papers)})")
-                    
-                    # Safety check to prevent excessive API calls
-                    if page_num >= 50:  # Reasonable upper limit for ~10,000 papers
-                        logger.warning("⚠️ Reached maximum page limit, stopping")
-                        break
-                
-                logger.info(f"✅ Successfully fetched {len(all_papers)} papers ({len(all_papers)/total_count*100:.1f}% of total)")
+            # The page count is known upfront, so overlap the HTTP round trips
+            with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+                futures = [
+                    executor.submit(fetch_page, ai_subfield_id, start_date_str, end_date_str, page_num)
+                    for page_num in range(1, total_pages + 1)
+                ]
                 
-            except Exception as e:
-                logger.warning(f"⚠️ Error during pagination: {e}")
-                logger.info("🔄 Falling back to single page fetch...")
-                # Fallback to simple get() if pagination fails
-                all_papers = works_query.get()
-                logger.info(f"📄 Fallback: fetched {len(all_papers)} papers")
-            
-            self.papers = all_papers
-            self.stats['papers_fetched'] = len(all_papers)
+                for page_num, future in enumerate(futures, 1):
+                    page_results = future.result()
+                    self.stats['papers_fetched'] += len(page_results)
+                    logger.info(f"  📄 Page {page_num}: fetched {len(page_results)} papers (total: {self.stats['papers_fetched']})")
+                    yield page_results
             
-            return True
+            fetched = self.stats['papers_fetched']
+            logger.info(f"✅ Successfully fetched {fetched} papers ({fetched/total_count*100:.1f}% of total)")
             
         except Exception as e:
-            logger.error(f"❌ Error fetching papers: {e}")
-            return False
+            logger.warning(f"⚠️ Error during pagination: {e}")
+            if self.stats['papers_fetched']:
+                # Pages already handed downstream can't be taken back; keep what we have
+                logger.warning(f"⚠️ Stopping early with {self.stats['papers_fetched']} papers")
+                return
+            logger.info("🔄 Falling back to single page fetch...")
+            # Fallback to simple get() if pagination fails
+            page_results = works_query.get()
+            self.stats['papers_fetched'] = len(page_results)
+            logger.info(f"📄 Fallback: fetched {len(page_results)} papers")
+            yield page_results
     
-    def save_papers_to_json(self) -> Optional[str]:
-        """Save papers to a timestamped JSON file in temp/ folder."""
-        if not self.papers:
-            logger.warning("⚠️ No papers to save")
-            return None
+    def save_papers_to_json(self, pages: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Back up papers to a timestamped zstd-compressed JSONL file in temp/ folder as they stream past.
         
+        Wraps the page iterator: each page is written to the backup and then
+        yielded unchanged, so the backup is built in the same pass as the
+        upload. Papers go one per line to <name>.jsonl.zst; the metadata is
+        written to a sibling <name>.meta.json once the total is known.
+        
+        Args:
+            pages: Iterable of raw paper pages
+            
+        Yields:
+            The same pages, unchanged
+        """
         # Create timestamp for filename
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"ai_field_subfield_papers_{timestamp}.json"
+        timestamp = self._run_started.strftime('%Y%m%d_%H%M%S')
+        filename = f"ai_field_subfield_papers_{timestamp}"
         
         # Ensure temp directory exists
         temp_dir = Path('temp')
         temp_dir.mkdir(exist_ok=True)
         
-        # Full file path
-        file_path = temp_dir / filename
+        # Full file paths
+        file_path = temp_dir / f"{filename}.jsonl.zst"
+        meta_path = temp_dir / f"{filename}.meta.json"
         
         logger.info(f"💾 Saving papers to: {file_path}")
         
-        # Prepare data for JSON serialization
-        output_data = {
-            'metadata': {
-                'timestamp': datetime.now().isoformat(),
-                'total_papers': len(self.papers),
-                'date_range_days': self.days,
-                'filter_criteria': 'Papers where Artificial Intelligence is the subfield (topics.subfield.id=1702)',
-                'ai_subfield_id': '1702',
-                'ai_subfield_full_id': 'https://openalex.org/subfields/1702',
-                'source': 'OpenAlex API - Direct Filtering'
-            },
-            'papers': self.papers
+        # One orjson-encoded paper per line, compressed as it is written. The
+        # records repeat the same topic/source names, so zstd level 3 shrinks
+        # the backup several times over for little CPU (on worker threads).
+        compressor = zstandard.ZstdCompressor(level=3, threads=-1)
+        total_papers = 0
+        with open(file_path, 'wb') as raw, compressor.stream_writer(raw) as f:
+            for page in pages:
+                if page:
+                    f.write(b'\n'.join(map(orjson.dumps, page)) + b'\n')
+                total_papers += len(page)
+                yield page
+        
+        # Metadata goes to its own file, once the total is known
+        metadata = {
+            'timestamp': self._run_started.isoformat(timespec='seconds'),
+            'total_papers': total_papers,
+            'date_range_days': self.days,
+            'filter_criteria': 'Papers where Artificial Intelligence is the subfield (topics.subfield.id=1702)',
+            'ai_subfield_id': '1702',
+            'ai_subfield_full_id': 'https://openalex.org/subfields/1702',
+            'source': 'OpenAlex API - Direct Filtering',
+            'papers_file': file_path.name
         }
+        meta_path.write_bytes(orjson.dumps(metadata, option=orjson.OPT_INDENT_2))
+        
+        logger.info(f"✅ Successfully saved {total_papers} papers to {file_path}")
+        logger.info(f"💾 Papers backed up to: {file_path} (metadata: {meta_path})")
+    
+    def _fetch_worker(self, pages: Iterable[List[Dict[str, Any]]], page_queue: queue.Queue,
+                      stop: threading.Event) -> None:
+        """
+        Drain the page iterator into the queue (runs on the fetch thread).
+        
+        Args:
+            pages: Iterable of raw paper pages (API fetch and JSON backup)
+            page_queue: Bounded queue shared with the uploader
+            stop: Set by the consumer when it gives up early
+        """
+        try:
+            for page in pages:
+                if stop.is_set():
+                    return
+                page_queue.put(page)
+        except Exception as e:
+            # Hand the failure to the consumer so it surfaces in the main thread
+            page_queue.put(e)
+        finally:
+            page_queue.put(None)
+    
+    def stream_pages(self, pages: Iterable[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Produce pages on a background thread while the caller consumes them.
         
-        # Save to JSON file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+        The OpenAlex fetch and JSON backup run on a fetch thread that feeds a
+        bounded queue, so API downloads keep going while the uploader is busy
+        in a COPY (both block in socket I/O with the GIL released). The queue
+        bound applies backpressure if the database falls behind.
         
-        logger.info(f"✅ Successfully saved {len(self.papers)} papers to {file_path}")
+        Args:
+            pages: Iterable of raw paper pages
+            
+        Yields:
+            The same pages, in order
+        """
+        page_queue = queue.Queue(maxsize=self.PAGE_QUEUE_SIZE)
+        stop = threading.Event()
+        producer = threading.Thread(
+            target=self._fetch_worker, args=(pages, page_queue, stop),
+            name="openalex-fetch", daemon=True
+        )
+        producer.start()
         
-        return str(file_path)
+        try:
+            while True:
+                page = page_queue.get()
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                yield page
+        finally:
+            # Unblock the producer if the consumer stopped before the end
+            stop.set()
+            while producer.is_alive():
+                try:
+                    page_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
     
     def ensure_table_exists(self) -> bool:
         """Ensure the papers table exists, create if necessary."""
@@ -222,255 +450,155 @@ class MarketDataPipeline:
             logger.error(f"❌ Error ensuring table exists: {e}")
             return False
     
-    def transform_paper_data(self, paper: Dict[str, Any]) -> Dict[str, Any]:
-        """Transform paper data from OpenAlex format to database schema format."""
-        # Extract basic information
-        paper_id = self.extract_paper_id(paper)
-        
-        # Extract source/journal information with safe navigation
-        primary_location = paper.get('primary_location') or {}
-        source = primary_location.get('source') or {}
-        
-        # Extract topic information (flattened) with safe navigation
-        topics = paper.get('topics') or []
-        primary_topic = topics[0] if topics else {}
-        subfield = primary_topic.get('subfield') or {}
-        field = primary_topic.get('field') or {}
-        domain = primary_topic.get('domain') or {}
-        
-        # Extract citation metrics with safe navigation
-        citation_metrics = paper.get('citation_metrics') or {}
-        
-        # Extract authorships with safe navigation
-        authorships = paper.get('authorships') or []
-        referenced_works = paper.get('referenced_works') or []
-        
-        # Transform the data with safe navigation
-        transformed = {
-            'id': paper_id,
-            'doi': paper.get('doi'),
-            'title': paper.get('title') or paper.get('display_name'),
-            'display_name': paper.get('display_name'),
-            
-            # Temporal data
-            'publication_year': paper.get('publication_year'),
-            'publication_date': paper.get('publication_date'),
-            'created_date': paper.get('created_date'),
-            'updated_date': paper.get('updated_date'),
-            
-            # Basic metadata
-            'language': paper.get('language'),
-            'paper_type': paper.get('type'),
-            'type_crossref': paper.get('type_crossref'),
-            
-            # Open Access information
-            'is_open_access': primary_location.get('is_oa'),
-            'oa_status': primary_location.get('oa_status'),
-            'oa_url': primary_location.get('pdf_url'),
-            
-            # Quantitative measures
-            'cited_by_count': paper.get('cited_by_count', 0),
-            'referenced_works_count': len(referenced_works),
-            'authors_count': len(authorships),
-            'countries_distinct_count': len(set(
-                author.get('country_code') 
-                for author in authorships
-                if author and author.get('country_code')
-            )),
-            'institutions_distinct_count': len(set(
-                inst.get('id')
-                for author in authorships
-                if author and author.get('institutions')
-                for inst in author.get('institutions') or []
-                if inst and inst.get('id')
-            )),
-            
-            # Citation metrics
-            'citation_normalized_percentile': citation_metrics.get('normalized_percentile'),
-            'is_in_top_1_percent': citation_metrics.get('is_in_top_1_percent', False),
-            'is_in_top_10_percent': citation_metrics.get('is_in_top_10_percent', False),
-            
-            # Source/Journal information
-            'journal_name': source.get('display_name'),
-            'journal_issn': source.get('issn_l'),
-            'journal_is_oa': source.get('is_oa'),
-            'journal_is_indexed_scopus': source.get('is_indexed_in_scopus'),
-            'journal_is_core': source.get('is_core'),
-            'journal_host_organization': source.get('host_organization_name'),
-            
-            # Topic classification (flattened)
-            'primary_topic_name': primary_topic.get('display_name'),
-            'primary_topic_score': primary_topic.get('score'),
-            'primary_subfield_name': subfield.get('display_name'),
-            'primary_field_name': field.get('display_name'),
-            'primary_domain_name': domain.get('display_name'),
-            
-            # Additional metadata
-            'is_retracted': paper.get('is_retracted', False),
-            'is_paratext': paper.get('is_paratext', False),
-            'has_fulltext': paper.get('has_fulltext', False),
-        }
-        
-        return transformed
+    def transform_paper_row(self, paper: Dict[str, Any]) -> tuple:
+        """Transform paper data from OpenAlex format to a papers row ordered like PAPER_FIELDS."""
+        return paper_to_row(paper)
     
     def extract_paper_id(self, paper: Dict[str, Any]) -> str:
         """Extract the unique paper ID from the paper data."""
-        # Try different ID fields in order of preference
-        if paper.get('id'):
-            return paper['id']
-        elif paper.get('doi'):
-            return paper['doi']
-        elif paper.get('ids', {}).get('openalex'):
-            return paper['ids']['openalex']
-        else:
-            # Generate a fallback ID if none exists
-            return f"fallback_{hash(str(paper))}"
-    
-    def check_paper_exists(self, paper_id: str) -> bool:
-        """Check if a paper already exists in the database."""
-        try:
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT 1 FROM papers WHERE id = %s", (paper_id,))
-            exists = cursor.fetchone() is not None
-            cursor.close()
-            return exists
-        except Exception as e:
-            logger.error(f"❌ Error checking if paper exists: {e}")
-            return False
+        return extract_paper_id(paper)
     
-    def insert_paper(self, paper_data: Dict[str, Any]) -> bool:
-        """Insert a single paper into the database."""
-        # Prepare the SQL statement with all fields
-        fields = [
-            'id', 'doi', 'title', 'display_name', 'publication_year', 'publication_date',
-            'created_date', 'updated_date', 'language', 'paper_type', 'type_crossref',
-            'is_open_access', 'oa_status', 'oa_url', 'cited_by_count', 'referenced_works_count',
-            'authors_count', 'countries_distinct_count', 'institutions_distinct_count',
-            'citation_normalized_percentile', 'is_in_top_1_percent', 'is_in_top_10_percent',
-            'journal_name', 'journal_issn', 'journal_is_oa', 'journal_is_indexed_scopus',
-            'journal_is_core', 'journal_host_organization', 'primary_topic_name',
-            'primary_topic_score', 'primary_subfield_name', 'primary_field_name',
-            'primary_domain_name', 'is_retracted', 'is_paratext', 'has_fulltext'
-        ]
-        
-        # Create placeholders for the SQL statement
-        placeholders = ', '.join(['%s'] * len(fields))
-        field_names = ', '.join(fields)
-        
-        sql = f"""
-        INSERT INTO papers ({field_names})
-        VALUES ({placeholders})
-        ON CONFLICT (id) DO UPDATE SET
-            updated_at = CURRENT_TIMESTAMP,
-            title = EXCLUDED.title,
-            display_name = EXCLUDED.display_name,
-            publication_year = EXCLUDED.publication_year,
-            publication_date = EXCLUDED.publication_date,
-            cited_by_count = EXCLUDED.cited_by_count,
-            referenced_works_count = EXCLUDED.referenced_works_count,
-            authors_count = EXCLUDED.authors_count,
-            countries_distinct_count = EXCLUDED.countries_distinct_count,
-            institutions_distinct_count = EXCLUDED.institutions_distinct_count,
-            citation_normalized_percentile = EXCLUDED.citation_normalized_percentile,
-            is_in_top_1_percent = EXCLUDED.is_in_top_1_percent,
-            is_in_top_10_percent = EXCLUDED.is_in_top_10_percent
+    def copy_papers(self, papers: List[Dict[str, Any]], cursor) -> Dict[str, int]:
         """
+        Transform papers and load them with a single COPY + merge.
         
-        try:
-            cursor = self.connection.cursor()
-            
-            # Prepare values in the correct order
-            values = [paper_data.get(field) for field in fields]
-            
-            cursor.execute(sql, values)
-            cursor.close()
-            return True
+        Rows are streamed into a staging table with COPY FROM STDIN and merged
+        into papers with one INSERT ... ON CONFLICT (id) DO UPDATE (see
+        bulk_load_papers), so a batch costs two round trips instead of one
+        INSERT per paper. The load runs under the papers_batch savepoint; if the
+        server rejects the batch it is retried row by row, so only the rows
+        that fail are counted as errors. The caller commits.
+        
+        Args:
+            papers: Raw OpenAlex paper records
+            cursor: Open cursor shared by the whole upload
             
-        except Exception as e:
-            logger.error(f"❌ Error inserting paper {paper_data.get('id', 'unknown')}: {e}")
-            return False
+        Returns:
+            Dict with 'inserted' and 'updated' row counts and 'errors' (papers that failed to transform)
+        """
+        rows = []
+        errors = 0
+        for i, paper in enumerate(papers, 1):
+            try:
+                rows.append(paper_to_row(paper))
+            except Exception as e:
+                logger.error(f"❌ Error processing paper {i}: {e}")
+                errors += 1
+        
+        inserted, updated = 0, 0
+        if rows:
+            try:
+                inserted, updated = bulk_load_papers(
+                    self.connection, rows, self.PAPER_FIELDS, return_counts=True,
+                    cursor=cursor, savepoint='papers_batch'
+                )
+            except psycopg2.Error as e:
+                # One bad row fails the whole COPY; retry row by row so only it is lost
+                logger.warning(f"⚠️ Batch COPY failed, retrying row by row: {e}")
+                cursor.execute("ROLLBACK TO SAVEPOINT papers_batch;")
+                inserted, updated, failed = bulk_load_papers_by_row(
+                    self.connection, rows, self.PAPER_FIELDS, 'papers_batch', cursor=cursor
+                )
+                errors += failed
+        return {'inserted': inserted, 'updated': updated, 'errors': errors}
     
-    def process_papers_batch(self, papers: List[Dict[str, Any]]) -> Dict[str, int]:
+    def process_papers_batch(self, papers: List[Dict[str, Any]], cursor) -> Dict[str, int]:
         """Process a batch of papers and insert them into the database."""
         stats = {
             'total': len(papers),
             'inserted': 0,
             'updated': 0,
-            'skipped': 0,
             'errors': 0
         }
         
         logger.info(f"Processing batch of {len(papers)} papers...")
         
-        for i, paper in enumerate(papers, 1):
-            try:
-                # Transform the paper data
-                transformed_paper = self.transform_paper_data(paper)
-                
-                # Check if paper already exists
-                if self.check_paper_exists(transformed_paper['id']):
-                    stats['skipped'] += 1
-                    if i % 100 == 0:
-                        logger.info(f"Progress: {i}/{len(papers)} papers processed (skipped: {stats['skipped']})")
-                    continue
-                
-                # Insert the paper
-                if self.insert_paper(transformed_paper):
-                    stats['inserted'] += 1
-                else:
-                    stats['errors'] += 1
-                
-                # Log progress every 100 papers
-                if i % 100 == 0:
-                    logger.info(f"Progress: {i}/{len(papers)} papers processed (inserted: {stats['inserted']}, errors: {stats['errors']})")
-                    
-            except Exception as e:
-                logger.error(f"❌ Error processing paper {i}: {e}")
-                stats['errors'] += 1
+        try:
+            copy_stats = self.copy_papers(papers, cursor)
+            stats['inserted'] = copy_stats['inserted']
+            stats['updated'] = copy_stats['updated']
+            stats['errors'] = copy_stats['errors']
+        except psycopg2.Error as e:
+            # copy_papers already falls back to row-by-row loads, so this is only
+            # reached if that fails too; batches loaded earlier in the transaction are kept
+            logger.error(f"❌ Error loading batch: {e}")
+            cursor.execute("ROLLBACK TO SAVEPOINT papers_batch;")
+            stats['errors'] = len(papers)
         
         return stats
     
-    def upload_papers_to_database(self) -> bool:
-        """Upload all fetched papers to the database."""
-        if not self.papers:
-            logger.warning("⚠️ No papers to upload")
-            return True
+    def upload_papers_to_database(self, pages: Iterable[List[Dict[str, Any]]]) -> bool:
+        """
+        Upload papers to the database as they stream in.
+        
+        Pages are regrouped into batches of batch_size; each batch is loaded
+        as soon as it is full, so uploading overlaps fetching. All batches
+        share one cursor and are committed every commit_every batches, which
+        cuts the number of WAL flushes per run.
         
+        Args:
+            pages: Iterable of raw paper pages
+        """
         if not self.connection:
             logger.error("❌ No database connection")
             return False
         
-        logger.info(f"📤 Uploading {len(self.papers)} papers to database...")
+        logger.info(f"📤 Uploading papers to database in batches of {self.batch_size}...")
         
         try:
-            total_papers = len(self.papers)
-            logger.info(f"Processing {total_papers} papers in batches of {self.batch_size}")
-            
             overall_stats = {
-                'total': total_papers,
+                'total': 0,
                 'inserted': 0,
                 'updated': 0,
-                'skipped': 0,
                 'errors': 0
             }
-            
-            # Process in batches
-            for i in range(0, total_papers, self.batch_size):
-                batch = self.papers[i:i + self.batch_size]
-                batch_stats = self.process_papers_batch(batch)
+            batch_num = 0
+            pending = []
+            # Pooled connections are already non-autocommit; switching modes here
+            # would fail inside the transaction left open by the setup queries
+            
+            def flush(batch, cursor):
+                nonlocal batch_num
+                # SET LOCAL lasts one transaction, so reapply it after every commit
+                if batch_num % self.commit_every == 0:
+                    apply_session_settings(self.connection, BULK_LOAD_SETTINGS, local=True)
+                batch_stats = self.process_papers_batch(batch, cursor)
                 
                 # Update overall stats
+                overall_stats['total'] += batch_stats['total']
                 overall_stats['inserted'] += batch_stats['inserted']
-                overall_stats['skipped'] += batch_stats['skipped']
+                overall_stats['updated'] += batch_stats['updated']
                 overall_stats['errors'] += batch_stats['errors']
                 
-                # Commit after each batch
+                batch_num += 1
+                if batch_num % self.commit_every == 0:
+                    self.connection.commit()
+                    logger.info(f"✅ Batch {batch_num} completed and committed")
+                else:
+                    logger.info(f"✅ Batch {batch_num} completed")
+            
+            # Process in batches on a single cursor
+            with self.connection.cursor() as cur:
+                for page in pages:
+                    pending.extend(page)
+                    while len(pending) >= self.batch_size:
+                        flush(pending[:self.batch_size], cur)
+                        del pending[:self.batch_size]
+                
+                if pending:
+                    flush(pending, cur)
+            
+            # Commit whatever the last partial group loaded
+            if batch_num % self.commit_every:
                 self.connection.commit()
-                logger.info(f"✅ Batch {i//self.batch_size + 1} completed and committed")
+            
+            if overall_stats['total'] == 0:
+                logger.warning("⚠️ No papers to upload")
+                return True
             
             # Update pipeline stats
             self.stats['papers_inserted'] = overall_stats['inserted']
-            self.stats['papers_skipped'] = overall_stats['skipped']
+            self.stats['papers_updated'] = overall_stats['updated']
             self.stats['errors'] = overall_stats['errors']
             
             # Final summary
@@ -478,14 +606,16 @@ class MarketDataPipeline:
             logger.info("-" * 40)
             logger.info(f"Total papers processed: {overall_stats['total']}")
             logger.info(f"Papers inserted: {overall_stats['inserted']}")
-            logger.info(f"Papers skipped (already exist): {overall_stats['skipped']}")
+            logger.info(f"Papers updated (already exist): {overall_stats['updated']}")
             logger.info(f"Errors: {overall_stats['errors']}")
-            logger.info(f"Success rate: {((overall_stats['inserted'] + overall_stats['skipped']) / overall_stats['total'] * 100):.1f}%")
+            logger.info(f"Success rate: {((overall_stats['inserted'] + overall_stats['updated']) / overall_stats['total'] * 100):.1f}%")
             
             return True
             
         except Exception as e:
             logger.error(f"❌ Error uploading papers: {e}")
+            # Discard batches loaded since the last commit
+            self.connection.rollback()
             return False
     
     def run_data_quality_tests(self) -> bool:
@@ -501,20 +631,15 @@ class MarketDataPipeline:
             tester = DataQualityTester(self.connection)
             results = tester.run_all_tests()
             
-            # Generate and display report
-            report = tester.generate_report()
-            print("\n" + report)
-            
-            # Save report to file
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            # Display the report and save it to file from a single encode
+            timestamp = self._run_started.strftime("%Y%m%d_%H%M%S")
             report_filename = f"reports/data_quality_report_{timestamp}.txt"
             
             # Ensure reports directory exists
             reports_dir = Path('reports')
             reports_dir.mkdir(exist_ok=True)
             
-            with open(report_filename, 'w', encoding='utf-8') as report_file:
-                report_file.write(report)
+            write_report(tester.generate_report(), report_filename)
             
             logger.info(f"📄 Report saved to: {report_filename}")
             
@@ -534,31 +659,31 @@ class MarketDataPipeline:
             if not self.connect_database():
                 return False
             
-            # Step 2: Fetch recent papers from API
-            if not self.fetch_recent_papers():
-                logger.error("❌ Failed to fetch papers from API")
+            # Step 2: Ensure database table exists (before any papers stream in)
+            if not self.ensure_table_exists():
+                logger.error("❌ Failed to ensure table exists")
                 return False
             
-            if not self.papers:
+            # Step 3: Fetch recent papers from API
+            pages = self.fetch_recent_papers()
+            first_page = next(pages, [])
+            
+            if not first_page:
                 logger.warning("⚠️ No papers found, pipeline completed")
                 return True
             
-            # Step 3: Save papers to JSON (optional, for backup)
-            json_file = self.save_papers_to_json()
-            if json_file:
-                logger.info(f"💾 Papers backed up to: {json_file}")
-            
-            # Step 4: Ensure database table exists
-            if not self.ensure_table_exists():
-                logger.error("❌ Failed to ensure table exists")
-                return False
-            
-            # Step 5: Upload papers to database
-            if not self.upload_papers_to_database():
+            # Steps 4-5: Stream pages through the JSON backup into the database,
+            # fetching on a background thread while batches are uploaded
+            pages = self.stream_pages(self.save_papers_to_json(chain([first_page], pages)))
+            if not self.upload_papers_to_database(pages):
                 logger.error("❌ Failed to upload papers to database")
                 return False
             
-            # Step 6: Run data quality tests (optional)
+            # Step 6: Refresh the dashboard's materialized views
+            if not refresh_papers_views(self.connection):
+                logger.warning("⚠️ Failed to refresh dashboard views, dashboard may show stale data")
+            
+            # Step 7: Run data quality tests (optional)
             if not skip_quality_tests:
                 if not self.run_data_quality_tests():
                     logger.warning("⚠️ Data quality tests failed, but pipeline completed")
@@ -583,10 +708,10 @@ class MarketDataPipeline:
         return {
             'papers_fetched': self.stats['papers_fetched'],
             'papers_inserted': self.stats['papers_inserted'],
-            'papers_skipped': self.stats['papers_skipped'],
+            'papers_updated': self.stats['papers_updated'],
             'errors': self.stats['errors'],
             'success_rate': (
-                (self.stats['papers_inserted'] + self.stats['papers_skipped']) / 
+                (self.stats['papers_inserted'] + self.stats['papers_updated']) / 
                 max(self.stats['papers_fetched'], 1) * 100
             ) if self.stats['papers_fetched'] > 0 else 0
         }
@@ -597,6 +722,7 @@ def main():
     parser = argparse.ArgumentParser(description='Market Data Pipeline - Consolidated Pipeline')
     parser.add_argument('--days', type=int, default=3, help='Number of days to look back for papers (default: 3)')
     parser.add_argument('--batch-size', type=int, default=100, help='Batch size for database operations (default: 100)')
+    parser.add_argument('--commit-every', type=int, default=5, help='Commit after this many batches (default: 5)')
     parser.add_argument('--force', action='store_true', help='Force recreation of papers table')
     parser.add_argument('--skip-quality-tests', action='store_true', help='Skip data quality tests')
     
@@ -609,7 +735,8 @@ def main():
     pipeline = MarketDataPipeline(
         days=args.days,
         batch_size=args.batch_size,
-        force_recreate=args.force
+        force_recreate=args.force,
+        commit_every=args.commit_every
     )
     
     success = pipeline.run_pipeline(skip_quality_tests=args.skip_quality_tests)
@@ -621,7 +748,7 @@ def main():
         print("-" * 30)
         print(f"Papers fetched: {summary['papers_fetched']}")
         print(f"Papers inserted: {summary['papers_inserted']}")
-        print(f"Papers skipped: {summary['papers_skipped']}")
+        print(f"Papers updated: {summary['papers_updated']}")
         print(f"Errors: {summary['errors']}")
         print(f"Success rate: {summary['success_rate']:.1f}%")
         print("\n✅ Pipeline completed successfully!")
@@ -0,0 +1,37 @@
+"""
+Tests for the COPY encoding used by bulk_load_papers.
+
+Run from the project root with: python -m unittest discover tests
+"""
+
+import unittest
+
+from modules.create_papers_table import build_bulk_load_sql, encode_copy_row
+
+
+class EncodeCopyRowTest(unittest.TestCase):
+    """encode_copy_row must keep empty strings distinct from NULL."""
+    
+    def test_empty_string_title_is_not_null(self):
+        line = encode_copy_row(("W1", "", None))
+        self.assertEqual(line, "W1\t\t\\N\n")
+    
+    def test_special_characters_are_escaped(self):
+        line = encode_copy_row(("a\tb", "line1\nline2\r", "back\\slash"))
+        self.assertEqual(line, "a\\tb\tline1\\nline2\\r\tback\\\\slash\n")
+    
+    def test_literal_null_marker_is_escaped(self):
+        # The two-character string \N must load as text, not as NULL
+        self.assertEqual(encode_copy_row(("\\N",)), "\\\\N\n")
+    
+    def test_non_string_values(self):
+        self.assertEqual(encode_copy_row((3, 0.5, True)), "3\t0.5\tTrue\n")
+    
+    def test_copy_uses_text_format(self):
+        copy_sql, stage_copy_sql, _ = build_bulk_load_sql(("id", "title"))
+        self.assertIn("FORMAT text", copy_sql)
+        self.assertIn("FORMAT text", stage_copy_sql)
+
+
+if __name__ == "__main__":
+    unittest.main()